@@ -3,16 +3,11 @@ import xarray as xr
 import re
 
 
-def format_results_for_tcs(data: xr.DataArray, params: dict, bafu: bool = False) -> dict:
+def _tcs_consumptions(data) -> list:
     """
-    Format the results for TCS.
+    Fuel and electricity consumption of each (powertrain, size, year) of the model.
     """
-
-    if bafu:
-        lca_results = data.bafu_results
-    else:
-        lca_results = data.results
-
+    consumptions = []
     for powertrain in data.array.coords["powertrain"].values:
         for size in data.array.coords["size"].values:
             for year in data.array.coords["year"].values:
@@ -22,47 +17,59 @@ def format_results_for_tcs(data: xr.DataArray, params: dict, bafu: bool = False)
                 electricity_consumption = data.array.sel(powertrain=powertrain, size=size,
                                                          parameter="electricity consumption", year=year).values
 
-                if powertrain not in ("PHEV-p", "PHEV-d"):
-                    emission_factor = BAFU_EMISSSION_FACTORS[powertrain]
+                consumptions.append((powertrain, size, year, fuel_consumption, electricity_consumption))
 
-                    for impact, value in emission_factor.items():
-                        lca_results.loc[dict(
-                            powertrain=powertrain,
-                            size=size,
-                            year=year,
-                            impact_category=impact,
-                            impact="energy chain",
-                        )] = float((fuel_consumption * value) + (electricity_consumption * value))
+    return consumptions
 
-                else:
-                    electricity_emission_factor = BAFU_EMISSSION_FACTORS["PHEV-e"]
 
-                    if powertrain == "PHEV-d":
-                        fuel_emission_factor = BAFU_EMISSSION_FACTORS["PHEV-c-d"]
-                    else:
-                        fuel_emission_factor = BAFU_EMISSSION_FACTORS["PHEV-c-p"]
+def _format_tcs_results(lca_results: xr.DataArray, consumptions: list, params: dict) -> dict:
+    """
+    Replaces the energy chain impacts by the BAFU emission factors
+    and maps the results to the TCS fields.
+    """
+
+    for powertrain, size, year, fuel_consumption, electricity_consumption in consumptions:
+        if powertrain not in ("PHEV-p", "PHEV-d"):
+            emission_factor = BAFU_EMISSSION_FACTORS[powertrain]
 
-                    for impact, value in electricity_emission_factor.items():
-                        lca_results.loc[dict(
-                            powertrain=powertrain,
-                            size=size,
-                            year=year,
-                            impact_category=impact,
-                            impact="energy chain"
-                        )] = float(
-                            electricity_consumption * value
-                        )
-
-                    for impact, value in fuel_emission_factor.items():
-                        lca_results.loc[dict(
-                            powertrain=powertrain,
-                            size=size,
-                            year=year,
-                            impact_category=impact,
-                            impact="energy chain"
-                        )] += float(
-                            fuel_consumption * value
-                        )
+            for impact, value in emission_factor.items():
+                lca_results.loc[dict(
+                    powertrain=powertrain,
+                    size=size,
+                    year=year,
+                    impact_category=impact,
+                    impact="energy chain",
+                )] = float((fuel_consumption * value) + (electricity_consumption * value))
+
+        else:
+            electricity_emission_factor = BAFU_EMISSSION_FACTORS["PHEV-e"]
+
+            if powertrain == "PHEV-d":
+                fuel_emission_factor = BAFU_EMISSSION_FACTORS["PHEV-c-d"]
+            else:
+                fuel_emission_factor = BAFU_EMISSSION_FACTORS["PHEV-c-p"]
+
+            for impact, value in electricity_emission_factor.items():
+                lca_results.loc[dict(
+                    powertrain=powertrain,
+                    size=size,
+                    year=year,
+                    impact_category=impact,
+                    impact="energy chain"
+                )] = float(
+                    electricity_consumption * value
+                )
+
+            for impact, value in fuel_emission_factor.items():
+                lca_results.loc[dict(
+                    powertrain=powertrain,
+                    size=size,
+                    year=year,
+                    impact_category=impact,
+                    impact="energy chain"
+                )] += float(
+                    fuel_consumption * value
+                )
 
     results = {}
 
@@ -77,14 +84,28 @@ def format_results_for_tcs(data: xr.DataArray, params: dict, bafu: bool = False)
         lca_results.loc[dict(impact_category="climate change", impact="energy chain")] = params["fuel_co2"]
 
     for field, subfield in TCS_IMPACTS_MAPPING.items():
-        results[field] = lca_results.sel(
+        results[field] = float(lca_results.sel(
             impact_category=subfield["impact_category"],
             impact=subfield["impact"]
-        ).sum().item()
+        ).sum())
 
     return results
 
 
+def format_results_for_tcs_both(data: xr.DataArray, params: dict) -> tuple:
+    """
+    Format both the ecoinvent and the BAFU results for TCS,
+    reading the vehicle consumptions only once.
+    :return: ecoinvent results, BAFU results
+    """
+
+    consumptions = _tcs_consumptions(data)
+
+    return (
+        _format_tcs_results(data.results, consumptions, params),
+        _format_tcs_results(data.bafu_results, consumptions, params),
+    )
+
 
 def format_results_for_swisscargo(data: xr.DataArray, params: dict) -> list:
     """
@@ -200,7 +221,7 @@ def format_results_for_swisscargo(data: xr.DataArray, params: dict) -> list:
 
     factor = 1
     if "func_unit" in params and params["func_unit"] == "tkm":
-        factor = 1 / (data.array.sel(parameter="cargo mass").values.item() / 1000)
+        factor = 1 / (float(data.array.sel(parameter="cargo mass")) * 1e-3)
 
     for powertrain in data.array.coords["powertrain"].values:
         for size in data.array.coords["size"].values:
@@ -269,7 +290,7 @@ def format_results_for_swisscargo(data: xr.DataArray, params: dict) -> list:
     for impact_category in lca_results.coords["impact_category"].values:
         result = {"category": impact_category}
         result.update({
-            i: lca_results.sel(impact_category=impact_category, impact=i).sum().item()
+            i: float(lca_results.sel(impact_category=impact_category, impact=i).sum())
             for i in lca_results.coords["impact"].values
         })
         results.append(result)
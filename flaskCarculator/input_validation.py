@@ -26,6 +26,122 @@ from .data.mapping import (
     TWO_WHEELER_BATTERIES,
 )
 
+# numeric types accepted in the input data; compared with ``type(x) in _NUM``
+# so that booleans are not silently accepted as numbers
+_NUM = (int, float)
+
+# default of dict.get() telling an absent field from one set to None
+_ABSENT = object()
+
+# optional numeric fields of a vehicle, and whether they must be greater than 0
+NUMERIC_FIELDS = (
+    ("curb mass", True),
+    ("cargo mass", True),
+    ("driving mass", True),
+    ("engine power", False),
+    ("total engine power", False),
+    ("fuel tank volume", False),
+    ("electric energy stored", True),
+    ("range", True),
+    ("TtW energy", True),
+)
+
+# top-level terms every request must provide, in the order they are reported
+MANDATORY_TERMS = (
+    "nomenclature",
+    "country_code",
+    "vehicles",
+)
+
+# fields every vehicle must provide
+REQUIRED_FIELDS = (
+    "id",
+    "vehicle_type",
+    "powertrain",
+    "year",
+    "size"
+)
+
+# fields a vehicle may provide, in any of the supported nomenclatures
+VALID_FIELDS = frozenset((
+    "id",
+    "vehicle_type",
+    "cycle",
+    "lifetime kilometers",
+    "kilometers per year",
+    "TtW energy",
+    "payload",
+    "cargo mass",
+    "driving mass",
+    "range",
+    "electric utility factor",
+    "power",
+    "curb mass",
+    "powertrain",
+    "size",
+    "year",
+    "battery technology",
+    "electric energy stored",
+    "battery lifetime replacements",
+    "fuel cell lifetime replacements",
+    "target_range",
+    "country",
+    "func_unit",
+    "scenario",
+    "method",
+    "indicator",
+    "diesel",
+    "petrol",
+    "methane",
+    "hydrogen",
+    "electricity",
+    "average passengers",
+    # TCS nomenclature
+    "fuel consumption",
+    "electricity consumption",
+    "fuel tank volume",
+    "primary power",
+    "direct_co2",
+    "fuel_co2",
+    "electric utility factor (wltp)",
+    # Swisscargo nomenclature
+    "interest rate",
+    "fuel cost",
+    "daily charger",
+    "occasional charger",
+    "electricity cost (daily charger)",
+    "electricity cost (occasional charger)",
+    "share km occasional charger",
+    "trucks using daily charger",
+    "hydrogen consumption",
+    "CNG consumption",
+    "hydrogen cost",
+    "CNG cost",
+    "canton",
+    "vehicle purchase",
+    "yearly insurance",
+    "maintenance cost",
+    "share depot charging",
+    "depot charger power",
+    "trucks per depot charger",
+    "insurance cost",
+    "energy cost per kWh (depot)",
+    "energy cost per kWh (public)",
+    "purchase cost",
+    "purchase_year",
+    "resale_year",
+    "share tolled roads",
+    "original class name",
+    "residual value share",
+    "depot charger lifetime",
+    "depot charger capex per kW",
+    "depot charger installation per kW",
+    "depot charger connection per kW",
+    "depot charger capacity charger per kW-year",
+    "lifetime_years",
+    "replacement_cost_included"
+))
+
 
 def get_mapping(vehicle_type: str) -> dict:
     """
@@ -66,173 +182,52 @@ def validate_input_data(data: dict) -> list:
     :return: list of errors
     """
 
-    # Check if required fields are present
-    required_fields = [
-        "id",
-        "vehicle_type",
-        "powertrain",
-        "year",
-        "size"
-    ]
-
-    list_parameters = [
-        "id",
-        "vehicle_type",
-        "cycle",
-        "lifetime kilometers",
-        "kilometers per year",
-        "TtW energy",
-        "payload",
-        "cargo mass",
-        "driving mass",
-        "range",
-        "electric utility factor",
-        "power",
-        "curb mass",
-        "powertrain",
-        "size",
-        "year",
-        "battery technology",
-        "electric energy stored",
-        "battery lifetime replacements",
-        "fuel cell lifetime replacements",
-        "target_range",
-        "country",
-        "func_unit",
-        "scenario",
-        "method",
-        "indicator",
-        "diesel",
-        "petrol",
-        "methane",
-        "hydrogen",
-        "electricity",
-        "average passengers",
-        # TCS nomenclature
-        "fuel consumption",
-        "electricity consumption",
-        "fuel tank volume",
-        "primary power",
-        "direct_co2",
-        "fuel_co2",
-        "electric utility factor (wltp)",
-        # Swisscargo nomenclature
-        "interest rate",
-        "fuel cost",
-        "daily charger",
-        "occasional charger",
-        "electricity cost (daily charger)",
-        "electricity cost (occasional charger)",
-        "share km occasional charger",
-        "trucks using daily charger",
-        "hydrogen consumption",
-        "CNG consumption",
-        "hydrogen cost",
-        "CNG cost",
-        "canton",
-        "vehicle purchase",
-        "yearly insurance",
-        "maintenance cost",
-        "share depot charging",
-        "depot charger power",
-        "trucks per depot charger",
-        "insurance cost",
-        "energy cost per kWh (depot)",
-        "energy cost per kWh (public)",
-        "purchase cost",
-        "purchase_year",
-        "resale_year",
-        "share tolled roads",
-        "original class name",
-        "residual value share",
-        "depot charger lifetime",
-        "depot charger capex per kW",
-        "depot charger installation per kW",
-        "depot charger connection per kW",
-        "depot charger capacity charger per kW-year",
-        "lifetime_years",
-        "replacement_cost_included"
-    ]
-
     errors = []
+    append = errors.append
 
+    for vehicle in data["vehicles"]:
+        vehicle_id = vehicle["id"]
 
-    for v, vehicle in enumerate(data["vehicles"]):
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in vehicle:
-                errors.append(f"Vehicle {vehicle['id']} missing required field: {field}")
+                append(f"Vehicle {vehicle_id} missing required field: {field}")
 
         for key in vehicle:
-            if key not in list_parameters:
-                errors.append(f"Vehicle {vehicle['id']} has invalid field: {key}")
+            if key not in VALID_FIELDS:
+                append(f"Vehicle {vehicle_id} has invalid field: {key}")
 
         vehicle_mapping = get_mapping(vehicle["vehicle_type"])
 
         # Check if 'size' is valid
-        if vehicle.get("size") not in vehicle_mapping["size"]:
-            errors.append(
-                f"Vehicle {vehicle['id']} has invalid size value: {vehicle.get('size')}. Should be one of {vehicle_mapping['size']}"
+        size = vehicle.get("size")
+        if size not in vehicle_mapping["size"]:
+            append(
+                f"Vehicle {vehicle_id} has invalid size value: {size}. Should be one of {vehicle_mapping['size']}"
             )
 
         # Check if 'powertrain' is valid
-        if vehicle.get("powertrain") not in vehicle_mapping["powertrain"]:
-            errors.append(
-                f"Vehicle {vehicle['id']} has invalid powertrain value: {vehicle.get('powertrain')}. Should be one of {vehicle_mapping['powertrain']}"
+        powertrain = vehicle.get("powertrain")
+        if powertrain not in vehicle_mapping["powertrain"]:
+            append(
+                f"Vehicle {vehicle_id} has invalid powertrain value: {powertrain}. Should be one of {vehicle_mapping['powertrain']}"
             )
 
-        # Check if 'curb mass' is a positive number
-        if "curb mass" in vehicle and not isinstance(vehicle["curb mass"], (int, float)):
-            errors.append(f"Vehicle {vehicle['id']} has invalid curb mass value: {vehicle['curb mass']} (must be a number)")
-        elif "curb mass" in vehicle and vehicle["curb mass"] <= 0:
-            errors.append(f"Vehicle {vehicle['id']} has: curb mass must be greater than 0.")
-
-        # Check if 'cargo mass' is a positive number
-        if "cargo mass" in vehicle and not isinstance(vehicle["cargo mass"], (int, float)):
-            errors.append(f"Vehicle {vehicle['id']} has invalid cargo mass value: {vehicle['cargo mass']} (must be a number)")
-        elif "cargo mass" in vehicle and vehicle["cargo mass"] <= 0:
-            errors.append(f"Vehicle {vehicle['id']}: cargo mass must be greater than 0.")
-
-        # Check if 'driving mass' is a positive number
-        if "driving mass" in vehicle and not isinstance(vehicle["driving mass"], (int, float)):
-            errors.append(f"Vehicle {vehicle['id']} has has invalid driving mass value: {vehicle['driving mass']} (must be a number)")
-        elif "driving mass" in vehicle and vehicle["driving mass"] <= 0:
-            errors.append(f"Vehicle {vehicle['id']}: driving mass must be greater than 0.")
-
-        # Check if engine powers are valid numbers
-        if "engine power" in vehicle and not isinstance(vehicle["engine power"], (int, float)):
-            errors.append(f"Vehicle {vehicle['id']} has invalid engine power value: {vehicle['engine power']} (must be a number)")
-
-        if "total engine power" in vehicle and not isinstance(vehicle["total engine power"], (int, float)):
-            errors.append(f"Vehicle {vehicle['id']} has invalid total engine power value: {vehicle['total engine power']} (must be a number)")
-
-        # Check if 'fuel tank volume' is a valid number
-        if "fuel tank volume" in vehicle and not isinstance(vehicle["fuel tank volume"], (int, float)):
-            errors.append(f"Vehicle {vehicle['id']} has invalid fuel tank mass value: {vehicle['fuel tank volume']} (must be a number)")
-
         # Check if `battery type` is valid
-        if "battery technology" in vehicle and vehicle["battery technology"] not in vehicle_mapping["battery"]:
-            errors.append(
-                f"Vehicle {vehicle['id']} has invalid battery type value: {vehicle['battery technology']}. Should be one of {vehicle_mapping['battery']}"
+        value = vehicle.get("battery technology", _ABSENT)
+        if value is not _ABSENT and value not in vehicle_mapping["battery"]:
+            append(
+                f"Vehicle {vehicle_id} has invalid battery type value: {value}. Should be one of {vehicle_mapping['battery']}"
             )
 
-        # Check if 'electric energy stored' is a valid number
-        if "electric energy stored" in vehicle and not isinstance(vehicle["electric energy stored"], (int, float)):
-            errors.append(f"Vehicle {v} has invalid battery capacity value: {vehicle['electric energy stored']} (must be a number)")
-        elif "electric energy stored" in vehicle and vehicle["electric energy stored"] <= 0:
-            errors.append(f"Vehicle {vehicle['id']}: electric energy stored must be greater than 0.")
-
-        # Check if 'range' is a valid number
-        if "range" in vehicle and not isinstance(vehicle["range"], (int, float)):
-            errors.append(f"Vehicle {v} has invalid range value: {vehicle['range']} (must be a number)")
-        elif "range" in vehicle and vehicle["range"] <= 0:
-            errors.append(f"Vehicle {v}: range must be greater than 0.")
-
-        # Check if 'TtW energy' (energy use, in kj) is a valid number
-        if "TtW energy" in vehicle and not isinstance(vehicle["TtW energy"], (int, float)):
-            errors.append(f"Vehicle {v} has invalid TtW energy value: {vehicle['TtW energy']} (must be a number)")
-        elif "TtW energy" in vehicle and vehicle["TtW energy"] <= 0:
-            errors.append(f"Vehicle {v}: TtW energy must be greater than 0.")
-
+        # Check that numeric fields are numbers, and positive where required
+        for field, positive in NUMERIC_FIELDS:
+            value = vehicle.get(field, _ABSENT)
+            if value is _ABSENT:
+                continue
+            if type(value) not in _NUM:
+                append(f"Vehicle {vehicle_id} has invalid {field} value: {value} (must be a number)")
+            elif positive and value <= 0:
+                append(f"Vehicle {vehicle_id}: {field} must be greater than 0.")
 
     return errors
 
@@ -353,6 +348,8 @@ def translate_tcs_to_carculator(data: dict, errors: list) -> [dict, list]:
 
     for vehicle in data["vehicles"]:
         new_vehicle = {}
+        # PHEV correction ratios between real-world and WLTP utility factors
+        ice_ratio, ev_ratio = None, None
 
         for k, v in TCS_PARAMETERS.items():
             if k in vehicle:
@@ -362,16 +359,21 @@ def translate_tcs_to_carculator(data: dict, errors: list) -> [dict, list]:
             if vehicle["fzklasse"] in TCS_SIZE:
                 new_vehicle["size"] = TCS_SIZE[vehicle["fzklasse"]]
 
-        if "tsa" in vehicle:
-            if vehicle["tsa"] in TCS_POWERTRAIN:
-                new_vehicle["powertrain"] = TCS_POWERTRAIN[vehicle["tsa"]]
+        tsa = vehicle.get("tsa")
+        if tsa is not None:
+            pt = TCS_POWERTRAIN.get(tsa)
+            if pt is not None:
+                new_vehicle["powertrain"] = pt
 
-            if "bat_km_WLTP" in vehicle:
-                if TCS_POWERTRAIN[vehicle["tsa"]] not in ["BEV", "FCEV"]:
-                    if TCS_POWERTRAIN.get(vehicle["tsa"]) in ["PHEV-p", "PHEV-d"]:
+                if "bat_km_WLTP" in vehicle and pt not in ("BEV", "FCEV"):
+                    if pt in ("PHEV-p", "PHEV-d"):
                         real_uf, wltp_uf = calculate_utility_factor(vehicle["bat_km_WLTP"])
-                        new_vehicle["electric utility factor"] = real_uf / 100
-                        new_vehicle["electric utility factor (wltp)"] = wltp_uf / 100
+                        real_frac, wltp_frac = real_uf / 100, wltp_uf / 100
+                        new_vehicle["electric utility factor"] = real_frac
+                        new_vehicle["electric utility factor (wltp)"] = wltp_frac
+                        # undefined for a WLTP utility factor of 0 or 1
+                        ice_ratio = (1 - real_frac) / (1 - wltp_frac) if wltp_frac != 1 else None
+                        ev_ratio = real_frac / wltp_frac if wltp_frac != 0 else None
                     else:
                         errors.append(f"Vehicle {vehicle['id']} has a battery range but is not one of BEV, .")
 
@@ -385,19 +387,21 @@ def translate_tcs_to_carculator(data: dict, errors: list) -> [dict, list]:
                 else:
                     new_vehicle["fuel consumption"] = vehicle["ver"]
                 new_vehicle["TtW energy"] += int(new_vehicle["fuel consumption"] * FUEL_SPECS[new_vehicle["powertrain"]]["lhv"] * 1000 / 100)
+            elif ice_ratio is None:
+                errors.append(f"Vehicle {vehicle['id']}: cannot correct the fuel consumption of a PHEV without a valid 'bat_km_WLTP'.")
             else:
-                new_vehicle["fuel consumption"] = vehicle["ver"] * ((1 - new_vehicle["electric utility factor"]) / (1 - new_vehicle["electric utility factor (wltp)"]))
+                new_vehicle["fuel consumption"] = vehicle["ver"] * ice_ratio
                 new_vehicle["TtW energy"] += int(new_vehicle["fuel consumption"] * FUEL_SPECS["ICEV-p"]["lhv"] * 1000 / 100)
-                new_vehicle["direct_co2"] = vehicle.get("direct_co2") * (
-                    (1 - new_vehicle["electric utility factor"]) / (1 - new_vehicle["electric utility factor (wltp)"])
-                )
+                new_vehicle["direct_co2"] = vehicle.get("direct_co2") * ice_ratio
 
         if "ver_strom" in vehicle:
             if new_vehicle["powertrain"] not in ("PHEV-p", "PHEV-d"):
                 new_vehicle["electricity consumption"] = vehicle["ver_strom"]
                 new_vehicle["TtW energy"] += int(new_vehicle["electricity consumption"] * 3.6 * 1000 / 100)
+            elif ev_ratio is None:
+                errors.append(f"Vehicle {vehicle['id']}: cannot correct the electricity consumption of a PHEV without a valid 'bat_km_WLTP'.")
             else:
-                new_vehicle["electricity consumption"] = vehicle["ver_strom"] * (new_vehicle["electric utility factor"] / new_vehicle["electric utility factor (wltp)"])
+                new_vehicle["electricity consumption"] = vehicle["ver_strom"] * ev_ratio
                 new_vehicle["TtW energy"] += int(new_vehicle["electricity consumption"] * 3.6 * 1000 / 100)
 
         # add other entries not in the mapping
@@ -433,22 +437,19 @@ def validate_input(data: dict) -> [list, list]:
     Validates the received data. Checks for required fields and valid values.
     Returns a list of errors, or an empty list if the data is valid.
     """
-    errors = []
-
-    MANDATORY_TERMS = [
-        "nomenclature",
-        "country_code",
-        "vehicles",
+    errors = [
+        f"Missing mandatory term: {term}"
+        for term in MANDATORY_TERMS
+        if term not in data
     ]
 
-    for term in MANDATORY_TERMS:
-        if term not in data:
-            errors.append(f"Missing mandatory term: {term}")
+    # no point translating or validating vehicles of a malformed request
+    if errors:
+        return data, errors
 
-    if data.get("nomenclature") == "tcs":
+    if data["nomenclature"] == "tcs":
         data, errors = translate_tcs_to_carculator(data, errors)
-
-    if data.get("nomenclature") == "swisscargo":
+    elif data["nomenclature"] == "swisscargo":
         data = translate_swisscargo_to_carculator(data)
 
     errors.extend(validate_input_data(data))
@@ -1,5 +1,10 @@
+import ast
+from functools import lru_cache
+from types import MappingProxyType
+
 import numpy as np
 import pandas as pd
+import xarray as xr
 from carculator import (
     CarInputParameters,
     CarModel,
@@ -53,129 +58,242 @@ models = {
     },
 }
 
+# position of each technology in carculator's custom electricity mix vector
+_TECH_INDICES = MappingProxyType({
+    "hydro": 0,
+    "nuclear": 1,
+    "gas": 2,
+    "solar": 3,
+    "wind": 4,
+    "biomass": 5,
+    "coal": 6,
+    "oil": 7,
+    "geothermal": 8,
+    "waste": 9,
+    "biogas_ccs": 10,
+    "biomass_ccs": 11,
+    "coal_ccs": 12,
+    "gas_ccs": 13,
+    "wood_ccs": 14,
+    "hydro_alpine": 15,
+    "gas_ccgt": 16,
+    "gas_chp": 17,
+    "solar_thermal": 18,
+    "wind_offshore": 19,
+    "lignite": 20,
+})
+
+# row i is the electricity mix made of 100% of technology i;
+# shared across requests, hence read-only
+_TECH_MATRIX = np.eye(len(_TECH_INDICES), dtype=np.float64)
+_TECH_MATRIX.setflags(write=False)
+
+# combustion and electric variants of each plug-in hybrid powertrain
+PHEV_VARIANTS = MappingProxyType({
+    "PHEV-d": ("PHEV-c-d", "PHEV-e"),
+    "PHEV-p": ("PHEV-c-p", "PHEV-e"),
+})
+
+# technology name -> its single-technology electricity mix
+_ELECTRICITY_MIXES = MappingProxyType(
+    {name: _TECH_MATRIX[i] for name, i in _TECH_INDICES.items()}
+)
+
 
+@lru_cache(maxsize=None)
 def load_bafu_emission_factors():
     """
     Load the BAFU emission factors from the CSV file.
+    The file is read once per process; the returned dataframe is shared
+    and must not be modified.
+    """
+    filepath = DATA_DIR / "bafu_emission_factors" / "scores.csv"
+
+    df = pd.read_csv(filepath)
+    # activity names are stored as the string of their key tuple
+    df["activity"] = df["name"].map(ast.literal_eval)
+
+    return df
+
+
+@lru_cache(maxsize=None)
+def get_static_array(vehicle_type, powertrain, size):
+    """
+    Returns the array of static input parameters for the given
+    vehicle type, powertrain and size.
+    The array is built once per process and shared: callers must work on a copy.
+    """
+    ip = models[vehicle_type]["input_parameters"]()
+    ip.static()
+
+    _, array = fill_xarray_from_input_parameters(
+        ip, scope={"powertrain": [powertrain], "size": [size]}
+    )
+
+    return array
+
+
+def select_year(array, year):
+    """
+    Returns the array for the given year, keeping `year` as a dimension of length one.
+    Years that are not in the array are linearly interpolated between
+    the two bracketing years, or extrapolated from the two closest ones.
     """
-    # Assuming the CSV file is in the same directory as this script
-    filepath = DATA_DIR / "bafu_emission_factors" / "scores.xlsx"
+    years = array.year.values
+    if year in years:
+        return array.sel(year=[year])
 
-    return pd.read_excel(filepath)
+    i = int(np.clip(np.searchsorted(years, year), 1, len(years) - 1))
+    y0, y1 = years[i - 1], years[i]
+    w = (year - y0) / (y1 - y0)
+
+    out = array.isel(year=[i - 1]) * (1 - w) + array.isel(year=[i]).values * w
+    return out.assign_coords(year=[year])
 
 
 def set_combustion_power_share(array, params):
     """
     Sets the combustion power share in the array based on the powertrain type.
     """
+    share = None
     if params["powertrain"] in ["HEV-d", "HEV-p"] and all(
         x in params for x in ["primary_engine_power", "total_engine_power"]
     ):
-        array.loc[dict(parameter="combustion power share")] = (
-            params["primary_engine_power"] / params["total_engine_power"]
-        )
+        share = params["primary_engine_power"] / params["total_engine_power"]
     elif params["powertrain"] in ["ICEV-d", "ICEV-p", "ICEV-g"]:
-        array.loc[dict(parameter="combustion power share")] = 1
+        share = 1
     elif params["powertrain"] in ["BEV", "FCEV"]:
-        array.loc[dict(parameter="combustion power share")] = 0
+        share = 0
+
+    if share is not None:
+        write_parameters(array, {"combustion power share": share})
 
     return array
 
 
+# user inputs that are copied as-is into the parameter of the same name
+PASSTHROUGH_PARAMETERS = (
+    "lifetime kilometers",
+    "average passengers",
+    "purchase cost",
+    "energy cost per kWh (public)",
+    "energy cost per kWh (depot)",
+    "share depot charging",
+    "maintenance cost",
+    "insurance cost",
+    "interest rate",
+    "share tolled roads",
+    "residual value share",
+    "depot charger lifetime",
+    "depot charger capex per kW",
+    "depot charger installation per kW",
+    "depot charger connection per kW",
+    "depot charger capacity charger per kW-year",
+)
+
+
 def set_vehicle_properties_before_run(model, params):
     """
     Sets various properties of the vehicle model based on the provided parameters.
     """
 
-    if "lifetime kilometers" in params:
-        model.array.loc[dict(parameter="lifetime kilometers")] = params[
-            "lifetime kilometers"
-        ]
-
-    if "average passengers" in params:
-        model.array.loc[dict(parameter="average passengers")] = params[
-            "average passengers"
-        ]
+    values = {p: params[p] for p in PASSTHROUGH_PARAMETERS if p in params}
 
     if "fuel tank volume" in params:
         fuel_density = FUEL_SPECS[params["powertrain"]]["density"]
-        model.array.loc[dict(parameter="fuel mass")] = (
-            params["fuel tank volume"] * fuel_density
-        )
+        values["fuel mass"] = params["fuel tank volume"] * fuel_density
+
+    if "daily charger" in params:
+        values["depot charger power"] = int(params["daily charger"].replace(" kW", ""))
 
+    if "depot charger capacity charger per kW-year" in params and "trucks per depot charger" in params:
+        values["trucks per depot charger"] = params["trucks per depot charger"]
 
-    if "purchase cost" in params:
-        model.array.loc[dict(parameter="purchase cost")] = params["purchase cost"]
+    write_parameters(model.array, values, parameter_index(model))
 
-    if "energy cost per kWh (public)" in params:
-        model.array.loc[dict(parameter="energy cost per kWh (public)")] = params[
-            "energy cost per kWh (public)"
-        ]
+    return model
 
-    if "energy cost per kWh (depot)" in params:
-        model.array.loc[dict(parameter="energy cost per kWh (depot)")] = params[
-            "energy cost per kWh (depot)"
-        ]
 
-    if "share depot charging" in params:
-        model.array.loc[dict(parameter="share depot charging")] = params[
-            "share depot charging"
-        ]
 
-    if "daily charger" in params:
-        model.array.loc[dict(parameter="depot charger power")] = int(params["daily charger"].replace(" kW", ""))
+def parameter_index(model):
+    """
+    Returns the position of each parameter along the `parameter` axis
+    of the model array. It is built on first use and kept on the model,
+    until the model array is replaced.
+    """
+    array, index = getattr(model, "_parameter_index", (None, None))
+    if array is not model.array:
+        index = {p: i for i, p in enumerate(model.array.coords["parameter"].values)}
+        model._parameter_index = (model.array, index)
 
-    if "maintenance cost" in params:
-        model.array.loc[dict(parameter="maintenance cost")] = params["maintenance cost"]
+    return index
 
-    if "insurance cost" in params:
-        model.array.loc[dict(parameter="insurance cost")] = params["insurance cost"]
 
-    if "interest rate" in params:
-        model.array.loc[dict(parameter="interest rate")] = params["interest rate"]
+def read_parameter(model, name):
+    """
+    Returns a copy of the values of a parameter, as a numpy array
+    shaped like the model array without its `parameter` axis.
+    """
+    return np.take(
+        model.array.values,
+        parameter_index(model)[name],
+        axis=model.array.get_axis_num("parameter"),
+    )
 
-    if "share tolled roads" in params:
-        model.array.loc[dict(parameter="share tolled roads")] = params[
-            "share tolled roads"
-        ]
 
-    if "residual value share" in params:
-        model.array.loc[dict(parameter="residual value share")] = params[
-            "residual value share"
-        ]
+def read_parameters(model, *names):
+    """
+    Returns copies of the values of several parameters, gathered with
+    a single positional read, in the same layout as `read_parameter`.
+    """
+    index = parameter_index(model)
+    axis = model.array.get_axis_num("parameter")
 
-    if "depot charger lifetime" in params:
-        model.array.loc[dict(parameter="depot charger lifetime")] = params[
-            "depot charger lifetime"
-        ]
+    return tuple(
+        np.moveaxis(
+            np.take(model.array.values, [index[n] for n in names], axis=axis), axis, 0
+        )
+    )
 
-    if "depot charger capex per kW" in params:
-        model.array.loc[dict(parameter="depot charger capex per kW")] = params[
-            "depot charger capex per kW"
-        ]
 
-    if "depot charger installation per kW" in params:
-        model.array.loc[dict(parameter="depot charger installation per kW")] = params[
-            "depot charger installation per kW"
-        ]
+def write_parameters(array, values, index=None):
+    """
+    Writes several parameters into the array in a single positional assignment.
+    :param array: xarray.DataArray with a `parameter` dimension
+    :param values: dict of parameter name -> scalar, or array shaped like
+    the array without its `parameter` axis
+    :param index: position of each parameter (see `parameter_index`),
+    looked up in the `parameter` coordinate if not given
+    """
+    if not values:
+        return
 
-    if "depot charger connection per kW" in params:
-        model.array.loc[dict(parameter="depot charger connection per kW")] = params[
-            "depot charger connection per kW"
-        ]
+    if index is None:
+        index = array.get_index("parameter")
+        positions = [index.get_loc(p) for p in values]
+    else:
+        positions = [index[p] for p in values]
 
-    if "depot charger capacity charger per kW-year" in params:
-        model.array.loc[
-            dict(parameter="depot charger capacity charger per kW-year")
-        ] = params["depot charger capacity charger per kW-year"]
+    axis = array.get_axis_num("parameter")
+    buffer = array.values
+    shape = buffer.shape[:axis] + buffer.shape[axis + 1:]
 
-        if "trucks per depot charger" in params:
-            model.array.loc[
-                dict(parameter="trucks per depot charger")
-            ] = params["trucks per depot charger"]
+    buffer[(slice(None),) * axis + (positions,)] = np.stack(
+        [np.broadcast_to(v, shape) for v in values.values()], axis=axis
+    )
 
-    return model
 
+def scale_parameters(model, names, factor):
+    """
+    Multiplies several parameters of the model array by a factor, in place.
+    """
+    if not names:
+        return
+
+    index = parameter_index(model)
+    axis = model.array.get_axis_num("parameter")
+
+    model.array.values[(slice(None),) * axis + ([index[n] for n in names],)] *= factor
 
 
 def set_vehicle_properties_after_run(model, params):
@@ -184,92 +302,80 @@ def set_vehicle_properties_after_run(model, params):
     """
 
     fuel_specs = FUEL_SPECS[params["powertrain"]]
+    values = {}
 
     if params.get("driving mass", 0) > 0:
-        model.array.loc[dict(parameter="driving mass")] = params["driving mass"]
+        values["driving mass"] = params["driving mass"]
 
     if params.get("TtW energy", 0) > 0:
-        model.array.loc[dict(parameter="TtW energy")] = params["TtW energy"]
+        values["TtW energy"] = params["TtW energy"]
 
     range_var = (
-        "target range" if "target range" in model.array.parameter.values else "range"
+        "target range" if "target range" in parameter_index(model) else "range"
     )
 
     if params.get("fuel consumption", 0) > 0:
-        model.array.loc[dict(parameter="fuel consumption")] = (
-            params["fuel consumption"] / 100
-        )
+        fuel_consumption = params["fuel consumption"] / 100
+        values["fuel consumption"] = fuel_consumption
 
         if params["powertrain"] != "FCEV":
-            model.array.loc[dict(parameter="TtW energy, combustion mode")] = (
-                params["fuel consumption"] / 100
-            ) * (fuel_specs["lhv"] * 1000)
-
-            model.array.loc[dict(parameter="TtW energy")] = (
-                params["fuel consumption"] / 100
-            ) * (fuel_specs["lhv"] * 1000)
+            values["TtW energy, combustion mode"] = fuel_consumption * (
+                fuel_specs["lhv"] * 1000
+            )
+            values["TtW energy"] = values["TtW energy, combustion mode"]
             # update fuel mass, which is the volume of fuel
             # consumed per kilometer times the range
             # times the density of the fuel
-            model.array.loc[dict(parameter="fuel mass")] = (
-                model.array.loc[dict(parameter="fuel consumption")]  # L/km
+            values["fuel mass"] = (
+                fuel_consumption  # L/km
                 * fuel_specs["density"]  # kg/L
-                * model.array.loc[dict(parameter=range_var)]
+                * read_parameter(model, range_var)
             )
 
         else:
-            model.array.loc[dict(parameter="TtW energy, electric mode")] = (
-                params["fuel consumption"] / 100
-            ) * 120000  # 120 MJ/kg for hydrogen
-
-            model.array.loc[dict(parameter="TtW energy")] = (
-                params["fuel consumption"] / 100
-            ) * 120000  # 120 MJ/kg for hydrogen
+            values["TtW energy, electric mode"] = (
+                fuel_consumption * 120000
+            )  # 120 MJ/kg for hydrogen
+            values["TtW energy"] = values["TtW energy, electric mode"]
 
             # update fuel mass, which is the mass of hydrogen
             # consumed per kilometer times the range
             # times the density of the fuel
-            model.array.loc[dict(parameter="fuel mass")] = (
-                model.array.loc[dict(parameter="fuel consumption")]  # kg/km
-                * model.array.loc[dict(parameter=range_var)]
+            values["fuel mass"] = (
+                fuel_consumption * read_parameter(model, range_var)  # kg/km
             )
 
-
     if params.get("electricity consumption", 0) > 0:
-        model.array.loc[dict(parameter="electricity consumption")] = (
+        values["electricity consumption"] = (
             params["electricity consumption"] / 100
         ) * 1.1  # include charging losses
-        model.array.loc[dict(parameter="TtW energy, electric mode")] = (
-            params["electricity consumption"] / 100 * 3600
-        )
-        model.array.loc[dict(parameter="TtW energy")] = (
+        values["TtW energy, electric mode"] = (
             params["electricity consumption"] / 100 * 3600
         )
+        values["TtW energy"] = values["TtW energy, electric mode"]
 
         # update range, which is the electric energy stored
         # divided by the electricity consumption per km
-        if "electric energy stored" in model.array.parameter.values:
-            model.array.loc[dict(parameter=range_var)] = (
-                model.array.loc[dict(parameter="electric energy stored")]
-                / (
-                    params.get("electricity consumption", 0) / 100
-                )  # exclude charging losses
-            ) * model.array.loc[dict(parameter="battery DoD")]
+        if "electric energy stored" in parameter_index(model):
+            values[range_var] = (
+                read_parameter(model, "electric energy stored")
+                / (params["electricity consumption"] / 100)  # exclude charging losses
+            ) * read_parameter(model, "battery DoD")
 
     if params.get("cargo mass", None):
-        model.array.loc[dict(parameter="cargo mass")] = params["cargo mass"]
-        model.array.loc[dict(parameter="total cargo mass")] = params["cargo mass"]
+        values["cargo mass"] = params["cargo mass"]
+        values["total cargo mass"] = params["cargo mass"]
 
     if "battery lifetime replacements" in params:
-        model.array.loc[dict(parameter="battery lifetime replacements")] = params[
-            "battery lifetime replacements"
-        ]
+        values["battery lifetime replacements"] = params["battery lifetime replacements"]
 
     if "fuel cell lifetime replacements" in params:
-        model.array.loc[dict(parameter="fuel cell lifetime replacements")] = params[
+        values["fuel cell lifetime replacements"] = params[
             "fuel cell lifetime replacements"
         ]
 
+    write_parameters(model.array, values, parameter_index(model))
+
     return model
 
 
@@ -281,117 +387,86 @@ def set_properties_for_plugin(model, params):
     :return:
     """
 
-    if "electric utility factor" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="electric utility factor")
-        ] = params["electric utility factor"]
+    values = {
+        p: params[p]
+        for p in ("electric utility factor", "TtW energy", "electric energy stored", "power", "driving mass")
+        if p in params
+    }
 
     if "electricity consumption" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="electricity consumption")
-        ] = (
+        values["electricity consumption"] = (
             params["electricity consumption"] / 100
         ) * 1.1  # charging losses
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="TtW energy, electric mode")
-        ] = (
-            (params["electricity consumption"] / 100)
-            / model.array.loc[
-                dict(
-                    powertrain=params["powertrain"], parameter="electric utility factor"
-                )
-            ]
-        ) * 3600
 
     if "fuel consumption" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="fuel consumption")
-        ] = (params["fuel consumption"] / 100)
         fuel_specs = FUEL_SPECS[params["powertrain"]]
-        model.array.loc[
-            dict(
-                powertrain=params["powertrain"], parameter="TtW energy, combustion mode"
-            )
-        ] = (params["fuel consumption"] / 100) * (fuel_specs["lhv"] * 1000)
-
-    if "TtW energy" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="TtW energy")
-        ] = params["TtW energy"]
-    if "electric energy stored" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="electric energy stored")
-        ] = params["electric energy stored"]
-
-    if "curb mass" in params and "powertrain" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="glider base mass")
-        ] += (
-            params["curb mass"]
-            - model.array.loc[
-                dict(powertrain=params["powertrain"], parameter="curb mass")
-            ]
+        values["fuel consumption"] = params["fuel consumption"] / 100
+        values["TtW energy, combustion mode"] = (params["fuel consumption"] / 100) * (
+            fuel_specs["lhv"] * 1000
         )
 
     if "primary power" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="combustion power")
-        ] = params["primary power"]
-    if "power" in params and "primary power" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="electric power")
-        ] = (params["power"] - params["primary power"])
-    if "power" in params:
-        model.array.loc[dict(powertrain=params["powertrain"], parameter="power")] = (
-            params["power"]
+        values["combustion power"] = params["primary power"]
+        if "power" in params:
+            values["electric power"] = params["power"] - params["primary power"]
+
+    if "electricity consumption" in params:
+        utility_factor = (
+            values["electric utility factor"]
+            if "electric utility factor" in values
+            else read_parameter(model, "electric utility factor")
         )
+        values["TtW energy, electric mode"] = (
+            (params["electricity consumption"] / 100) / utility_factor
+        ) * 3600
 
-    if "driving mass" in params:
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="driving mass")
-        ] = params["driving mass"]
+    if "curb mass" in params and "powertrain" in params:
+        values["glider base mass"] = read_parameter(model, "glider base mass") + (
+            params["curb mass"] - read_parameter(model, "curb mass")
+        )
 
-    model.array.loc[
-        dict(powertrain=params["powertrain"], parameter="oxidation energy stored")
-    ] = model.array.loc[
-        dict(powertrain=params["powertrain"], parameter="fuel mass")
-    ] * (
+    values["oxidation energy stored"] = read_parameter(model, "fuel mass") * (
         FUEL_SPECS[params["powertrain"]]["lhv"]  # MJ/liter
         / FUEL_SPECS[params["powertrain"]]["density"]  # kg/liter
         / 3.6
     )
 
+    # the model array only holds the requested powertrain
+    write_parameters(model.array, values, parameter_index(model))
+
     model.set_vehicle_masses()
     model.set_component_masses()
 
     p = "range"
-    if "target range" in model.array.parameter.values:
+    if "target range" in parameter_index(model):
         p = "target range"
 
-    model.array.loc[dict(parameter=p)] = (
-        (
-            model.array.loc[dict(parameter="electric energy stored")]
-            * model.array.loc[dict(parameter="battery DoD")]
-        )
-        / model.array.loc[dict(parameter="electricity consumption")]
-    ) + (
-        model.array.loc[dict(parameter="oxidation energy stored")]
-        / (
-            model.array.loc[dict(parameter="fuel consumption")]
-            * FUEL_SPECS[params["powertrain"]]["lhv"]
-            / 3.6
-        )
+    fuel_specs = FUEL_SPECS[params["powertrain"]]
+    (
+        energy_stored,
+        battery_dod,
+        electricity_consumption,
+        oxidation_energy_stored,
+        fuel_consumption,
+    ) = read_parameters(
+        model,
+        "electric energy stored",
+        "battery DoD",
+        "electricity consumption",
+        "oxidation energy stored",
+        "fuel consumption",
     )
-
-    model.array.loc[
-        dict(powertrain=params["powertrain"], parameter="fuel mass")
-    ] = model.array.loc[dict(powertrain=params["powertrain"], parameter=p)] * (
-        model.array.loc[
-            dict(powertrain=params["powertrain"], parameter="fuel consumption")
-        ]
-        * FUEL_SPECS[params["powertrain"]]["density"]
+    vehicle_range = (energy_stored * battery_dod / electricity_consumption) + (
+        oxidation_energy_stored / (fuel_consumption * fuel_specs["lhv"] / 3.6)
     )
 
+    values = {
+        p: vehicle_range,
+        "fuel mass": vehicle_range * fuel_consumption * fuel_specs["density"],
+    }
+
+    write_parameters(model.array, values, parameter_index(model))
+
     return model
 
 
@@ -406,7 +481,7 @@ def redimension_battery_and_range(m, params):
         if params["powertrain"] not in ["PHEV-d", "PHEV-p"]:
             var = (
                 "target range"
-                if "target range" in m.array.parameter.values
+                if "target range" in parameter_index(m)
                 else "range"
             )
             m[var] = m["electric energy stored"] * 3600 / m["TtW energy, electric mode"]
@@ -414,7 +489,7 @@ def redimension_battery_and_range(m, params):
             m.override_battery_capacity()
 
             if params.get(var, 0) > 0:
-                m.array.loc[dict(parameter=var)] = params[var]
+                write_parameters(m.array, {var: params[var]}, parameter_index(m))
 
 
 
@@ -423,22 +498,18 @@ def initialize_model(params, nomenclature=None):
     Initializes and returns a CarModel instance with the given parameters.
     """
 
-    input_parameters = models[params["vehicle_type"]]["input_parameters"]
-
-    ip = input_parameters()
-    ip.static()
-
-    _, array = fill_xarray_from_input_parameters(
-        ip, scope={"powertrain": [params["powertrain"]], "size": [params["size"]]}
+    # selecting the year returns a new array, so the cached one is left untouched
+    array = select_year(
+        get_static_array(params["vehicle_type"], params["powertrain"], params["size"]),
+        params["year"],
     )
-    array = array.interp(year=[params["year"]], kwargs={"fill_value": "extrapolate"})
     array = set_combustion_power_share(array, params)
 
     model = models[params["vehicle_type"]]["model"]
 
     annual_mileage = None
     if params.get("kilometers per year", None):
-        array.loc[dict(parameter="kilometers per year")] = params["kilometers per year"]
+        write_parameters(array, {"kilometers per year": params["kilometers per year"]})
         annual_mileage = {
             (params["powertrain"], params["size"], params["year"]): params[
                 "kilometers per year"
@@ -483,48 +554,22 @@ def initialize_model(params, nomenclature=None):
             (params["powertrain"], params["size"], params["year"]): params["TtW energy"]
         }
 
+    # PHEV values also apply to their combustion and electric variants
+    powertrains = (params["powertrain"], *PHEV_VARIANTS.get(params["powertrain"], ()))
+
     payload = None
     if params.get("payload", 0) > 0:
         payload = {
-            (params["powertrain"], params["size"], params["year"]): params["payload"]
+            (pt, params["size"], params["year"]): params["payload"]
+            for pt in powertrains
         }
 
-        if params["powertrain"] == "PHEV-d":
-            payload.update(
-                {("PHEV-c-d", params["size"], params["year"]): params["payload"]}
-            )
-            payload.update(
-                {("PHEV-e", params["size"], params["year"]): params["payload"]}
-            )
-        if params["powertrain"] == "PHEV-p":
-            payload.update(
-                {("PHEV-c-p", params["size"], params["year"]): params["payload"]}
-            )
-            payload.update(
-                {("PHEV-e", params["size"], params["year"]): params["payload"]}
-            )
-
     target_range = None
     if params.get("target_range", 0) > 0:
         target_range = {
-            (params["powertrain"], params["size"], params["year"]): params[
-                "target_range"
-            ]
+            (pt, params["size"], params["year"]): params["target_range"]
+            for pt in powertrains
         }
-        if params["powertrain"] == "PHEV-d":
-            target_range.update(
-                {("PHEV-c-d", params["size"], params["year"]): params["target_range"]}
-            )
-            target_range.update(
-                {("PHEV-e", params["size"], params["year"]): params["target_range"]}
-            )
-        if params["powertrain"] == "PHEV-p":
-            target_range.update(
-                {("PHEV-c-p", params["size"], params["year"]): params["target_range"]}
-            )
-            target_range.update(
-                {("PHEV-e", params["size"], params["year"]): params["target_range"]}
-            )
 
     # build fuel blends
     fuel_blends = {}
@@ -542,9 +587,9 @@ def initialize_model(params, nomenclature=None):
 
             if fuel == "hydrogen":
                 if params[fuel] == "hydrogen - electrolysis - PEM (renewables)":
-                    electricity_mix = np.zeros(21)
-                    electricity_mix[0] = 1
-                    electricity_mix = {"custom electricity mix": [electricity_mix]}
+                    electricity_mix = {
+                        "custom electricity mix": [_ELECTRICITY_MIXES["hydro"]]
+                    }
                     fuel_blends[fuel] = {
                         "primary": {
                             "type": "hydrogen - electrolysis - PEM",
@@ -615,36 +660,12 @@ def initialize_model(params, nomenclature=None):
 
     electricity_mix = None
 
-    technology_indices = {
-        "hydro": 0,
-        "nuclear": 1,
-        "gas": 2,
-        "solar": 3,
-        "wind": 4,
-        "biomass": 5,
-        "coal": 6,
-        "oil": 7,
-        "geothermal": 8,
-        "waste": 9,
-        "biogas_ccs": 10,
-        "biomass_ccs": 11,
-        "coal_ccs": 12,
-        "gas_ccs": 13,
-        "wood_ccs": 14,
-        "hydro_alpine": 15,
-        "gas_ccgt": 16,
-        "gas_chp": 17,
-        "solar_thermal": 18,
-        "wind_offshore": 19,
-        "lignite": 20,
-    }
-
     if "electricity" in params:
         if params["electricity"] != "grid":
-            if params["electricity"] in technology_indices:
-                electricity_mix = np.zeros(21)
-                electricity_mix[technology_indices[params["electricity"]]] = 1
-                electricity_mix = {"custom electricity mix": [electricity_mix]}
+            if params["electricity"] in _ELECTRICITY_MIXES:
+                electricity_mix = {
+                    "custom electricity mix": [_ELECTRICITY_MIXES[params["electricity"]]]
+                }
 
     m.inventory = inventory(
         m,
@@ -657,7 +678,7 @@ def initialize_model(params, nomenclature=None):
 
     if nomenclature not in ("swisscargo",):
         results = m.inventory.calculate_impacts()
-        m.results = results.sel(value=0)
+        m.results = results.isel(value=0)
 
     # if nomenclature = "tcs" or "swiss-cargo",
     # we also want to provide results
@@ -684,16 +705,33 @@ def initialize_model(params, nomenclature=None):
                 "total",
             ]
 
+        # positions of activities and categories in the B matrix,
+        # so that each category is written in a single assignment
+        activity_index = {
+            a: i for i, a in enumerate(m.inventory.B.coords["activity"].values)
+        }
+        category_index = {
+            c: i for i, c in enumerate(m.inventory.B.coords["category"].values)
+        }
+
         for category in categories:
             if category != "total":
                 factors = df.loc[df["impact"] == category]
             else:
                 factors = df.loc[df["impact"] != "climate change"]
-                factors = factors.groupby("name").sum(numeric_only=True).reset_index()
+                factors = factors.groupby("name", as_index=False).agg(
+                    activity=("activity", "first"), score=("score", "sum")
+                )
 
-            for name in factors["name"].values:
-                val = factors.loc[factors["name"] == name, "score"].values.item(0)
-                m.inventory.B.loc[dict(activity=eval(name), category=category)] = val
+            # only the first score is used for activities listed twice
+            factors = factors.drop_duplicates(subset="name")
+
+            m.inventory.B[
+                dict(
+                    category=category_index[category],
+                    activity=[activity_index[a] for a in factors["activity"].values],
+                )
+            ] = xr.DataArray(factors["score"].to_numpy(), dims="activity")
 
         results = m.inventory.calculate_impacts()
 
@@ -704,7 +742,7 @@ def initialize_model(params, nomenclature=None):
                 ]
             )
 
-        m.bafu_results = results.sel(value=0)
+        m.bafu_results = results.isel(value=0)
 
     m.version = models[params["vehicle_type"]]["version"]
     m.ecoinvent_version = models[params["vehicle_type"]]["ecoinvent version"]
@@ -9,6 +9,80 @@ from .data.mapping import TCS_SIZE, TCS_PARAMETERS, TCS_POWERTRAIN, CAR_POWERTRA
     CAR_BATTERIES
 
 
+CHECKED_FIELDS = (
+    #"curb mass",
+    #"driving mass",
+    "power",
+    "battery capacity",
+    "TtW energy",
+    "fuel consumption",
+    "electricity consumption",
+    "range",
+    "target range",
+    "lifetime kilometers",
+    "kilometers per year",
+    "average passengers",
+    #"electric energy stored",
+)
+
+SHOWN_ERROR_FIELDS = (
+    "lifetime kilometers",
+    "kilometers per year",
+    "average passengers",
+    "capacity utilization",
+   # "daily distance",
+   # "number of trips",
+   # "distance per trip",
+   # "average speed",
+    "power",
+   # "electric power",
+    "TtW energy",
+   # "TtW energy, combustion mode",
+   # "TtW energy, electric mode",
+    "TtW efficiency",
+    "fuel consumption",
+    "electricity consumption",
+   # "electric utility factor",
+    "range",
+    "target range",
+   # "battery technology",
+    "electric energy stored",
+   # "battery lifetime kilometers",
+   # "battery cell energy density",
+   # "battery cycle life",
+   # "battery lifetime replacements",
+   # "fuel cell system efficiency",
+   # "fuel cell lifetime replacements",
+   # "oxidation energy stored",
+   # "fuel mass",
+   # "charger mass",
+   # "converter mass",
+   # "inverter mass",
+   # "power distribution unit mass",
+   # "combustion engine mass",
+   # "electric engine mass",
+   # "powertrain mass",
+   # "fuel cell stack mass",
+   # "fuel cell ancillary BoP mass",
+   # "fuel cell essential BoP mass",
+   # "battery cell mass",
+   # "battery BoP mass",
+   # "fuel tank mass",
+    "available payload",
+    "curb mass",
+    "cargo mass",
+    "total cargo mass",
+    "driving mass",
+)
+
+# the model stores consumptions per km, with charging losses for electricity
+OUTPUT_FACTORS = {
+    "fuel consumption": 100,
+    "electricity consumption": 100 / 1.1,
+}
+
+
+
 def validate_output_data(data: xr.DataArray, request: dict, nomenclature: str) -> list:
     """
     Validates the received data against the original request.
@@ -19,84 +93,29 @@ def validate_output_data(data: xr.DataArray, request: dict, nomenclature: str) -
 
     errors = []
 
-    fields = [
-        #"curb mass",
-        #"driving mass",
-        "power",
-        "battery capacity",
-        "TtW energy",
-        "fuel consumption",
-        "electricity consumption",
-        "range",
-        "target range",
-        "lifetime kilometers",
-        "kilometers per year",
-        "average passengers",
-        #"electric energy stored",
-    ]
-
-    shown_error_fields = [
-        "lifetime kilometers",
-        "kilometers per year",
-        "average passengers",
-        "capacity utilization",
-       # "daily distance",
-       # "number of trips",
-       # "distance per trip",
-       # "average speed",
-        "power",
-       # "electric power",
-        "TtW energy",
-       # "TtW energy, combustion mode",
-       # "TtW energy, electric mode",
-        "TtW efficiency",
-        "fuel consumption",
-        "electricity consumption",
-       # "electric utility factor",
-        "range",
-        "target range",
-       # "battery technology",
-        "electric energy stored",
-       # "battery lifetime kilometers",
-       # "battery cell energy density",
-       # "battery cycle life",
-       # "battery lifetime replacements",
-       # "fuel cell system efficiency",
-       # "fuel cell lifetime replacements",
-       # "oxidation energy stored",
-       # "fuel mass",
-       # "charger mass",
-       # "converter mass",
-       # "inverter mass",
-       # "power distribution unit mass",
-       # "combustion engine mass",
-       # "electric engine mass",
-       # "powertrain mass",
-       # "fuel cell stack mass",
-       # "fuel cell ancillary BoP mass",
-       # "fuel cell essential BoP mass",
-       # "battery cell mass",
-       # "battery BoP mass",
-       # "fuel tank mass",
-        "available payload",
-        "curb mass",
-        "cargo mass",
-        "total cargo mass",
-        "driving mass"
-    ]
-
-    for field in fields:
-        if field in request:
-            if field in ["fuel consumption", "electricity consumption"]:
-                factor = 100
-                # remove charging losses
-                if field == "electricity consumption":
-                    factor /= 1.1
-            else:
-                factor = 1
-
-            if not np.isclose(request[field], data.array.sel(parameter=field, value=0, powertrain=request["powertrain"]).values * factor, rtol=0.02):
-                params = [p for p in shown_error_fields if p in data.array.coords['parameter'].values]
+    # hash-based lookups, instead of scanning the coordinate values
+    parameters = data.array.get_index("parameter")
+
+    # mismatches are not reported for TCS
+    present = [] if nomenclature == "tcs" else [field for field in CHECKED_FIELDS if field in request]
+
+    if present:
+        values = (
+            data.array.sel(parameter=present, value=0, powertrain=request["powertrain"])
+            .transpose("parameter", ...)
+            .values.reshape(len(present), -1)
+        )
+        expected = np.array([request[field] for field in present], dtype=float)
+        factors = np.array([OUTPUT_FACTORS.get(field, 1) for field in present])
+        mismatches = ~np.isclose(
+            expected[:, None], values * factors[:, None], rtol=0.02
+        ).all(axis=1)
+
+        d = None
+        for i in np.flatnonzero(mismatches):
+            field = present[i]
+            if d is None:
+                params = [p for p in SHOWN_ERROR_FIELDS if p in parameters]
                 d = {
                     k: v for k, v in zip(
                         params,
@@ -110,13 +129,12 @@ def validate_output_data(data: xr.DataArray, request: dict, nomenclature: str) -
                      )
                 }
 
-                if nomenclature != "tcs":
-                    errors.append(f"Vehicle {request['id']} has invalid value for field {field}."
-                                  f" Expected {request[field]}, got {data.array.sel(parameter=field, value=0, powertrain=request['powertrain']).values}"
-                                  f"{d}")
+            errors.append(f"Vehicle {request['id']} has invalid value for field {field}."
+                          f" Expected {request[field]}, got {values[i]}"
+                          f"{d}")
 
     # check that available payload is still positive
-    if "gross mass" in data.array.coords['parameter'].values:
+    if "gross mass" in parameters:
         # check if any value for driving mass is superior to gross mass
         if (
                 data.array.sel(parameter="driving mass", value=0, powertrain=request["powertrain"])
@@ -1,18 +1,170 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, repeat
+import gc
+import hashlib
+import multiprocessing
+import os
+import threading
 import time
+from types import MappingProxyType
 
 from .input_validation import validate_input
-from .lca import initialize_model
-from .formatting import format_results_for_tcs, format_results_for_swisscargo
+from .lca import (
+    initialize_model,
+    get_static_array,
+    load_bafu_emission_factors,
+    scale_parameters,
+)
+from .formatting import format_results_for_tcs_both, format_results_for_swisscargo
 from .swiss_cargo_costs import calculate_lsva_charge_period, canton_truck_tax
-import json
 import numpy as np
+import orjson
 
 from .ai_commentary import ai_compare_across_vehicles_swisscargo
 from .ai_extract import build_compare_payload_swisscargo
 
 main = Blueprint('main', __name__)
 
+# processed vehicles of earlier requests, most recently used last;
+# off unless a size is set, as it outlives model and data updates
+VEHICLE_CACHE_SIZE = int(os.getenv("VEHICLE_CACHE_SIZE", "0"))
+_VEHICLE_CACHE = OrderedDict()
+_VEHICLE_CACHE_LOCK = threading.Lock()
+
+# vehicles of a request are computed one after the other, unless a pool size is set:
+# they are then spread over a long-lived pool of that many threads (VEHICLE_THREADS)
+# or processes (VEHICLE_PROCESSES), shared by all the requests of the worker
+VEHICLE_THREADS = int(os.getenv("VEHICLE_THREADS", "0"))
+VEHICLE_PROCESSES = int(os.getenv("VEHICLE_PROCESSES", "0"))
+# the processes are spawned, not forked, as the worker already runs threads;
+# they import this module too, but must not start pools of their own
+if VEHICLE_PROCESSES > 0 and multiprocessing.parent_process() is None:
+    _VEHICLE_EXECUTOR = ProcessPoolExecutor(
+        max_workers=VEHICLE_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+    )
+elif VEHICLE_THREADS > 0:
+    _VEHICLE_EXECUTOR = ThreadPoolExecutor(max_workers=VEHICLE_THREADS, thread_name_prefix="vehicle")
+else:
+    _VEHICLE_EXECUTOR = None
+
+# AI comparisons run in the background while the response is streamed
+_AI_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai-compare")
+
+# parameters of the model reported with each vehicle
+DEFAULT_VEHICLE_PARAMETERS = (
+    "lifetime kilometers",
+    "kilometers per year",
+    "average passengers",
+    "capacity utilization",
+    "daily distance",
+    "number of trips",
+    "distance per trip",
+    "average speed",
+    "driving mass",
+    "power",
+    "electric power",
+    "TtW energy",
+    "TtW energy, combustion mode",
+    "TtW energy, electric mode",
+    "TtW efficiency",
+    "fuel consumption",
+    "electricity consumption",
+    "electric utility factor",
+    "range",
+    "target range",
+    "battery technology",
+    "electric energy stored",
+    "battery lifetime kilometers",
+    "battery cell energy density",
+    "battery cycle life",
+    "battery lifetime replacements",
+    "fuel cell system efficiency",
+    "fuel cell lifetime replacements",
+    "oxidation energy stored",
+    "glider base mass",
+    "lightweighting",
+    "suspension mass",
+    "braking system mass",
+    "wheels and tires mass",
+    "cabin mass",
+    "electrical system mass",
+    "other components mass",
+    "transmission mass",
+    "fuel mass",
+    "charger mass",
+    "converter mass",
+    "inverter mass",
+    "power distribution unit mass",
+    "combustion engine mass",
+    "electric engine mass",
+    "powertrain mass",
+    "exhaust system mass",
+    "fuel cell stack mass",
+    "fuel cell ancillary BoP mass",
+    "fuel cell essential BoP mass",
+    "battery cell mass",
+    "battery BoP mass",
+    "energy battery mass",
+    "fuel tank mass",
+    "curb mass",
+    "cargo mass",
+    "total cargo mass",
+    "gross mass",
+)
+
+COST_RESULTS_PARAMETERS = (
+    "energy cost",
+    "energy infrastructure cost",
+    "amortised purchase cost",
+    "maintenance cost",
+    "insurance cost",
+    "toll cost",
+    "CO2 tax cost",
+    "amortised component replacement cost",
+    "amortised residual credit",
+)
+
+# purchase cost and its components, which carculator gives in EUR
+PURCHASE_COST_COMPONENTS = (
+    "battery onboard charging infrastructure cost",
+    "combustion exhaust treatment cost",
+    "combustion powertrain cost",
+    "electric powertrain cost",
+    "energy battery cost",
+    "fuel cell cost",
+    "fuel tank cost",
+    "glider cost",
+    "heat pump cost",
+    "lightweighting cost",
+    "power battery cost",
+    "purchase cost",
+)
+
+# additional parameters reported for swisscargo
+SWISSCARGO_VEHICLE_PARAMETERS = (
+    "energy cost per kWh (depot)",
+    "energy cost per kWh (public)",
+    "share depot charging",
+    "interest rate",
+) + PURCHASE_COST_COMPONENTS
+
+# parameters reported with each swisscargo vehicle
+SWISSCARGO_DEFAULT_VEHICLE_PARAMETERS = DEFAULT_VEHICLE_PARAMETERS + SWISSCARGO_VEHICLE_PARAMETERS
+
+# orjson options of the responses: numpy values are serialized natively,
+# and non-string keys (e.g., years) are turned into strings
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+CARCULATOR_MODEL_LABELS = MappingProxyType({
+    "truck": "carculator_truck",
+    "car": "carculator",
+    "bus": "carculator_bus",
+    "two-wheeler": "carculator_two_wheeler",
+})
+
+
 @main.route("/")
 def home():
     return "FlaskCarculator is running!"
@@ -27,10 +179,18 @@ def calculate_lca():
     start = time.monotonic()
     deadline = start + 28.0
 
-    data = request.json
-
-    ai_compare = bool((data or {}).get("ai_compare", False))
-    ai_language = (data or {}).get("language") or (
+    # parse the raw body directly, in a single pass
+    try:
+        data = orjson.loads(request.get_data())
+    except orjson.JSONDecodeError as e:
+        return jsonify({"error": "Invalid input data", "details": [f"Invalid JSON: {e}"]}), 400
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid input data", "details": ["Expected a JSON object."]}), 400
+
+    ai_compare = bool(data.get("ai_compare", False))
+    # recompute the vehicles even if an earlier request already did (e.g., after a model update)
+    use_cache = VEHICLE_CACHE_SIZE > 0 and not data.get("no_cache", False)
+    ai_language = data.get("language") or (
         (request.headers.get("Accept-Language") or "en").split(",")[0].split("-")[0]
     )
 
@@ -39,282 +199,489 @@ def calculate_lca():
     if len(validation_errors) > 0:
         return jsonify({"error": "Invalid input data", "details": validation_errors}), 400
 
-    default_vehicle_parameters = [
-        "lifetime kilometers",
-        "kilometers per year",
-        "average passengers",
-        "capacity utilization",
-        "daily distance",
-        "number of trips",
-        "distance per trip",
-        "average speed",
-        "driving mass",
-        "power",
-        "electric power",
-        "TtW energy",
-        "TtW energy, combustion mode",
-        "TtW energy, electric mode",
-        "TtW efficiency",
-        "fuel consumption",
-        "electricity consumption",
-        "electric utility factor",
-        "range",
-        "target range",
-        "battery technology",
-        "electric energy stored",
-        "battery lifetime kilometers",
-        "battery cell energy density",
-        "battery cycle life",
-        "battery lifetime replacements",
-        "fuel cell system efficiency",
-        "fuel cell lifetime replacements",
-        "oxidation energy stored",
-        "glider base mass",
-        "lightweighting",
-        "suspension mass",
-        "braking system mass",
-        "wheels and tires mass",
-        "cabin mass",
-        "electrical system mass",
-        "other components mass",
-        "transmission mass",
-        "fuel mass",
-        "charger mass",
-        "converter mass",
-        "inverter mass",
-        "power distribution unit mass",
-        "combustion engine mass",
-        "electric engine mass",
-        "powertrain mass",
-        "exhaust system mass",
-        "fuel cell stack mass",
-        "fuel cell ancillary BoP mass",
-        "fuel cell essential BoP mass",
-        "fuel cell lifetime replacements",
-        "battery cell mass",
-        "battery BoP mass",
-        "energy battery mass",
-        "fuel tank mass",
-        "curb mass",
-        "cargo mass",
-        "total cargo mass",
-        "driving mass",
-        "gross mass",
-    ]
-
-    cost_results_parameters = [
-        "energy cost",
-        "energy infrastructure cost",
-        "amortised purchase cost",
-        "maintenance cost",
-        "insurance cost",
-        "toll cost",
-        "CO2 tax cost",
-        "amortised component replacement cost",
-        "amortised residual credit",
-    ]
-
-    if data.get("nomenclature") == "swisscargo":
-        default_vehicle_parameters.extend([
-            "energy cost per kWh (depot)",
-            "energy cost per kWh (public)",
-            "share depot charging",
-            "interest rate",
-            "battery onboard charging infrastructure cost",
-            "combustion exhaust treatment cost",
-            "combustion powertrain cost",
-            "electric powertrain cost",
-            "energy battery cost",
-            "fuel cell cost",
-            "fuel tank cost",
-            "glider cost",
-            "heat pump cost",
-            "lightweighting cost",
-            "power battery cost",
-            "purchase cost",
-        ])
-
-    import gc
-
-    for vehicle in data["vehicles"]:
-        model, errors = initialize_model(vehicle, data.get("nomenclature"))
+    nomenclature = data.get("nomenclature")
+    is_swisscargo = nomenclature == "swisscargo"
+    default_vehicle_parameters = (
+        SWISSCARGO_DEFAULT_VEHICLE_PARAMETERS if is_swisscargo else DEFAULT_VEHICLE_PARAMETERS
+    )
+
+    country_code = data["country_code"]
+    # vehicles that only differ by their id have the same results: compute them once,
+    # unless an earlier request already did (the fresh results replace the cached ones)
+    input_vehicles = data["vehicles"]
+    groups = _group_identical_vehicles(input_vehicles)
+    cache_keys = [_vehicle_cache_key(key, nomenclature, country_code) for key in groups]
+    members = list(groups.values())
+    computed = [_get_cached_vehicle(key) if use_cache else None for key in cache_keys]
+    missing = [g for g, vehicle in enumerate(computed) if vehicle is None]
+
+    vehicles = [input_vehicles[members[g][0]] for g in missing]
+    results = _compute_vehicles(
+        vehicles,
+        nomenclature,
+        country_code,
+        default_vehicle_parameters,
+        COST_RESULTS_PARAMETERS,
+    )
+    ai_language = ai_language if ai_compare and is_swisscargo else None
+
+    # newline-delimited JSON: each vehicle is sent as soon as it is computed
+    if request.args.get("stream") == "ndjson":
+        return Response(
+            stream_with_context(_stream_ndjson(
+                data, members, computed, cache_keys, missing, results, ai_language, deadline
+            )),
+            status=200,
+            mimetype='application/x-ndjson',
+            direct_passthrough=True,
+        )
+
+    results = list(results)
+    for _, errors in results:
         if errors:
             return jsonify({"error": "Output validation issues", "details": errors}), 500
 
-        # --- compute results just like before ---
-        if data.get("nomenclature") == "tcs":
-            vehicle["results_ecoinvent"] = format_results_for_tcs(data=model, params=vehicle)
-            for k, v in vehicle["results_ecoinvent"].items():
-                if not np.isfinite(v):
-                    vehicle["results_ecoinvent"][k] = 0.0
-            vehicle["results_bafu"] = format_results_for_tcs(data=model, params=vehicle, bafu=True)
-            for k, v in vehicle["results_bafu"].items():
-                if not np.isfinite(v):
-                    vehicle["results_bafu"][k] = 0.0
-
-        elif data.get("nomenclature") == "swisscargo":
-            vehicle["results"] = format_results_for_swisscargo(data=model, params=vehicle)
-            # add cost results
-            factor = 1 if model.inventory.func_unit == "vkm" else (1 / (model.array.sel(parameter="cargo mass").values.item() / 1000))
-
-            vehicle["cost_results"] = {
-                p: model.array.sel(parameter=p).mean().values.item() * factor for p in cost_results_parameters
-            }
+    for g, (vehicle, _) in zip(missing, results):
+        _cache_vehicle(cache_keys[g], vehicle)
+        computed[g] = vehicle
 
-            # currently, it is normalized by the technical lifetime kilometers of the truck
-            # and we want to normalize it instead by the kilometers driven during the ownership period
-            lifetime_km = vehicle.get("lifetime kilometers",
-                                      model.array.sel(parameter="lifetime kilometers").values.item())
-            years_of_ownership = vehicle["resale_year"] - vehicle["purchase_year"]
-            km_per_year = vehicle.get("kilometers per year",
-                                      model.array.sel(parameter="kilometers per year").values.item())
-            km_during_ownership = years_of_ownership * km_per_year
-
-            factor_ownership = lifetime_km / km_during_ownership
-
-            # we need to figure out what was provided by the user (in CHF)
-            # and what need to be converted from EUR to CHF
-            eur_to_chf = 0.94
-            for cost_type in cost_results_parameters:
-                if cost_type == "energy cost":
-                    continue
-                if cost_type == "amortised purchase cost":
-                    vehicle["cost_results"][cost_type] *= factor_ownership
-                    eu_to_ch_price_levels_difference = 1.3
-                    vehicle["cost_results"][cost_type] *= eur_to_chf
-                    vehicle["cost_results"][cost_type] *= eu_to_ch_price_levels_difference
-
-
-                    if "purchase cost" in vehicle and vehicle["purchase cost"] > 0:
-                        pass
-                    else:
-                        costs = [
-                            "battery onboard charging infrastructure cost",
-                            "combustion exhaust treatment cost",
-                            "combustion powertrain cost",
-                            "electric powertrain cost",
-                            "energy battery cost",
-                            "fuel cell cost",
-                            "fuel tank cost",
-                            "glider cost",
-                            "heat pump cost",
-                            "lightweighting cost",
-                            "power battery cost",
-                            "purchase cost"
-                        ]
-                        model.array.loc[dict(parameter=costs)] *= eu_to_ch_price_levels_difference
-                        model.array.loc[dict(parameter=costs)] *= eur_to_chf
-
-                if cost_type == "maintenance cost":
-                    if "maintenance cost" in vehicle and vehicle["maintenance cost"] > 0:
-                        continue
-                    else:
-                        eu_to_ch_price_levels_difference = 1.3  # EUR prices are lower than CHF prices
-                        vehicle["cost_results"][cost_type] *= eur_to_chf
-                        vehicle["cost_results"][cost_type] *= eu_to_ch_price_levels_difference
-
-                        model.array.loc[dict(parameter="maintenance cost")] *= eu_to_ch_price_levels_difference
-                        model.array.loc[dict(parameter="maintenance cost")] *= eur_to_chf
-
-                if cost_type == "insurance cost":
-                    if "insurance cost" in vehicle and vehicle["insurance cost"] > 0:
-                        continue
-                    else:
-                        eu_to_ch_price_levels_difference = 1.3  # EUR prices are lower than CHF prices
-                        vehicle["cost_results"][cost_type] *= eur_to_chf
-                        vehicle["cost_results"][cost_type] *= eu_to_ch_price_levels_difference
-                        model.array.loc[dict(parameter="insurance cost")] *= eu_to_ch_price_levels_difference
-                        model.array.loc[dict(parameter="insurance cost")] *= eur_to_chf
-
-                if cost_type == "amortised component replacement cost":
-                    vehicle["cost_results"][cost_type] *= factor_ownership
-                    if vehicle["powertrain"] in ("BEV", "FCEV"):
-                        if vehicle.get("replacement_cost_included", False) is False:
-                            # we assume the components replacement cost is borne by the next owner
-                            # hence we zero it out here
-                            vehicle["cost_results"][cost_type] = 0.0
-
-            lsva_costs = calculate_lsva_charge_period(vehicle)
-
-            # add LSVA/RPLP road charge calculation
-            vehicle["cost_results"]["CO2 tax cost"] =  lsva_costs["cost_per_km_chf"] * factor
-            vehicle["road charge details"] = lsva_costs
-
-            # add cantonal road charge
-            canton_road_charge = canton_truck_tax(vehicle)
-            vehicle["cost_results"]["canton road charge cost"] = canton_road_charge["chf_per_km"] * factor
-            vehicle["canton tax details"] = canton_road_charge
+    # cached vehicles are shared: each submitted vehicle gets a shallow copy with its own id
+    processed = [None] * len(input_vehicles)
+    for indices, vehicle in zip(members, computed):
+        for i in indices:
+            processed[i] = {**vehicle, "id": input_vehicles[i]["id"]}
 
-        else:
-            vehicle["results"] = serialize_xarray(model.results)
-
-        # harvest parameters
-        for p in default_vehicle_parameters:
-            if p in model.array.parameter.values:
-                if p in ("fuel consumption", "electricity consumption"):
-                    val = model.array.sel(parameter=p).mean().values.item() * 100
-                else:
-                    val = model.array.sel(parameter=p).mean().values.item()
-                if not np.isfinite(val):
-                    val = 0.0
-                vehicle[p] = val
-
-        vehicle["battery chemistry"] = list(model.energy_storage["electric"].values())[0]
-        vehicle["indicators"] = model.inventory.method
-        vehicle["indicator type"] = model.inventory.indicator
-        vehicle["scenario"] = model.inventory.scenario
-        vehicle["functional unit"] = model.inventory.func_unit
-
-        carculator_model_labels = {
-            "truck": "carculator_truck",
-            "car": "carculator",
-            "bus": "carculator_bus",
-            "two-wheeler": "carculator_two_wheeler"
-        }
-        vehicle[f"{carculator_model_labels[vehicle['vehicle_type']]} version"] = ".".join(map(str, model.version))
-
-        if data.get("nomenclature", "carculator") in ("swisscargo", "tcs"):
-            vehicle["LCA background database"] = "UVEK 2022"
-        else:
-            vehicle["LCA background database"] = f"ecoinvent - cutoff - {model.ecoinvent_version}"
-        vehicle["country"] = data["country_code"]
-
-        # --- free memory NOW ---
-        del model
-        gc.collect()
-
-    if ai_compare and data.get("nomenclature") == "swisscargo":
-        payload = build_compare_payload_swisscargo(data["vehicles"], include_stage_shares=False)
-
-        RESPONSE_BUFFER = 8.0  # time to JSON, send, jitter
-        MIN_AI_BUDGET = 4.0  # won't call AI unless we can give this much
-        remaining = deadline - time.monotonic()
-        ai_budget = remaining - RESPONSE_BUFFER
-
-        if ai_budget >= MIN_AI_BUDGET:
-            ai_timeout = min(7.5, ai_budget)  # allow up to ~7.5 s
-            data["ai_comparison"] = ai_compare_across_vehicles_swisscargo(
-                payload, language=ai_language, detail="compact", timeout_s=ai_timeout
-            )
-            data["ai_timing"] = {
-                "remaining_before_ai_s": round(remaining, 2),
-                "ai_budget_s": round(ai_timeout, 2)
-            }  # keep while debugging
-        else:
-            data["ai_comparison_note"] = (
-                f"Skipped AI (remaining={remaining:.2f}s, needs ≥{MIN_AI_BUDGET + RESPONSE_BUFFER:.1f}s)."
-            )
+    data["vehicles"] = processed
+
+    # the AI call runs while the vehicles are being streamed,
+    # its answer is appended at the end of the response
+    ai_items = () if ai_language is None else _ai_comparison(processed, ai_language, deadline)
+
+    option = JSON_OPTIONS
+    # indentation roughly doubles the payload: only on request
+    if request.args.get("pretty") == "1":
+        option |= orjson.OPT_INDENT_2
 
     return Response(
-        json.dumps(data, indent=2, sort_keys=False),  # Serialize using the ordered structure
+        stream_with_context(_stream_json(data, option=option, tail=ai_items)),
         status=200,
         mimetype='application/json',
+        direct_passthrough=True,
+    )
+
+
+def _compute_vehicles(vehicles: list, nomenclature: str, *args):
+    """
+    Runs _process_vehicle on each vehicle.
+    :return: iterator of (vehicle, errors), in the order of the vehicles,
+    yielded as soon as each vehicle is computed
+    """
+    # vehicles are independent: spread them over the pool, if there is one,
+    # unless there are too few to be worth it
+    if _VEHICLE_EXECUTOR is not None and len(vehicles) > 2:
+        # processes have caches of their own, filled on their first vehicles
+        if isinstance(_VEHICLE_EXECUTOR, ThreadPoolExecutor):
+            _warm_caches(vehicles, nomenclature)
+        # map() yields the results in the order of the vehicles
+        yield from _VEHICLE_EXECUTOR.map(
+            _process_vehicle, vehicles, repeat(nomenclature), *(repeat(arg) for arg in args)
+        )
+    else:
+        for vehicle in vehicles:
+            yield _process_vehicle(vehicle, nomenclature, *args)
+
+    # the models are gone: reclaim their reference cycles in one pass
+    gc.collect()
+
+
+def _ai_comparison(vehicles: list, ai_language: str, deadline: float):
+    """
+    Starts the AI comparison of the processed vehicles in the background,
+    if enough time is left before the deadline.
+    :return: iterable of the (key, value) response entries describing it
+    """
+    payload = build_compare_payload_swisscargo(vehicles, include_stage_shares=False)
+
+    RESPONSE_BUFFER = 8.0  # time to JSON, send, jitter
+    MIN_AI_BUDGET = 4.0  # won't call AI unless we can give this much
+    remaining = deadline - time.monotonic()
+    ai_budget = remaining - RESPONSE_BUFFER
+
+    if ai_budget < MIN_AI_BUDGET:
+        return (
+            ("ai_comparison_note",
+             f"Skipped AI (remaining={remaining:.2f}s, needs ≥{MIN_AI_BUDGET + RESPONSE_BUFFER:.1f}s)."),
+        )
+
+    ai_timeout = min(7.5, ai_budget)  # allow up to ~7.5 s
+    ai_future = _AI_EXECUTOR.submit(
+        ai_compare_across_vehicles_swisscargo,
+        payload, language=ai_language, detail="compact", timeout_s=ai_timeout
+    )
+    return _ai_comparison_items(
+        ai_future,
+        {
+            "remaining_before_ai_s": round(remaining, 2),
+            "ai_budget_s": round(ai_timeout, 2)
+        },  # keep while debugging
+    )
+
+
+def _ai_comparison_items(future, ai_timing: dict):
+    """
+    Waits for the AI comparison and yields the response entries describing it.
+    The response is already being streamed: a failure is reported in a note.
+    """
+    try:
+        yield "ai_comparison", future.result()
+    except Exception as e:
+        yield "ai_comparison_note", f"AI comparison failed: {e}"
+        return
+    yield "ai_timing", ai_timing
+
+
+def _json_default(obj):
+    """
+    Fallback of orjson for the values it does not serialize natively.
+    """
+    # xarray objects
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    # non-contiguous numpy arrays
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _dumps_or_error(value, option: int, **fields) -> bytes:
+    """
+    Serializes a value of a streamed response. The status is sent before the body,
+    so a value that cannot be serialized is replaced by an error record, with the
+    given fields (e.g., the id of the vehicle), instead of truncating the response.
+    """
+    try:
+        return orjson.dumps(value, default=_json_default, option=option)
+    except orjson.JSONEncodeError as err:
+        return orjson.dumps(
+            {**fields, "error": "Serialization issues", "details": [str(err)]}, option=option
+        )
+
+
+def _stream_json(data: dict, option: int, tail=()):
+    """
+    Serializes the response one vehicle at a time, so that the whole
+    JSON document never has to be held in memory.
+    orjson keeps the insertion order of the keys and serializes numpy values natively.
+    :param data: response dict
+    :param option: orjson options
+    :param tail: (key, value) pairs appended after those of `data`, only consumed
+    once `data` has been written
+    A value that cannot be serialized is written as an error record (see _dumps_or_error).
+    """
+    yield b"{"
+    for i, (key, value) in enumerate(chain(data.items(), tail)):
+        if i > 0:
+            yield b","
+        yield orjson.dumps(key) + b":"
+        if key == "vehicles":
+            yield b"["
+            for j, vehicle in enumerate(value):
+                if j > 0:
+                    yield b","
+                yield _dumps_or_error(vehicle, option, id=vehicle.get("id"))
+            yield b"]"
+        else:
+            yield _dumps_or_error(value, option)
+    yield b"}"
+
+
+def _stream_ndjson(
+    data: dict,
+    members: list,
+    computed: list,
+    cache_keys: list,
+    missing: list,
+    results,
+    ai_language,
+    deadline: float,
+):
+    """
+    Serializes the response as newline-delimited JSON: one line per vehicle,
+    written as soon as it is available, then one line with the rest of the response.
+    A vehicle failing the output validation, or that cannot be serialized,
+    gets a line with its errors instead.
+    :param members: indices of the submitted vehicles of each group of identical vehicles
+    :param computed: processed vehicle of each group, None if it is still to compute
+    :param missing: groups still to compute, in the order of `results`
+    :param results: iterator of (vehicle, errors) of the missing groups
+    :param ai_language: language of the AI comparison, None to skip it
+    """
+    input_vehicles = data["vehicles"]
+    option = JSON_OPTIONS
+    processed = []
+
+    def lines(g, vehicle):
+        # cached vehicles are shared: each line gets a shallow copy with its own id
+        for i in members[g]:
+            copied = {**vehicle, "id": input_vehicles[i]["id"]}
+            processed.append(copied)
+            yield _dumps_or_error(copied, option, id=copied["id"]) + b"\n"
+
+    for g, vehicle in enumerate(computed):
+        if vehicle is not None:
+            yield from lines(g, vehicle)
+
+    for g, (vehicle, errors) in zip(missing, results):
+        if errors:
+            for i in members[g]:
+                yield orjson.dumps({
+                    "id": input_vehicles[i]["id"],
+                    "error": "Output validation issues",
+                    "details": errors,
+                }, default=_json_default, option=option) + b"\n"
+            continue
+        _cache_vehicle(cache_keys[g], vehicle)
+        yield from lines(g, vehicle)
+
+    rest = {key: value for key, value in data.items() if key != "vehicles"}
+    if ai_language is not None and processed:
+        rest.update(_ai_comparison(processed, ai_language, deadline))
+    yield _dumps_or_error(rest, option) + b"\n"
+
+
+def _process_vehicle(
+    vehicle: dict,
+    nomenclature: str,
+    country_code: str,
+    default_vehicle_parameters: tuple,
+    cost_results_parameters: tuple,
+) -> [dict, list]:
+    """
+    Runs the LCA of a single vehicle and adds the results to it.
+    Runs in the vehicle pool, if any, when several vehicles are submitted;
+    as it may be a process pool, it only receives and returns plain (picklable) data.
+    :return: the vehicle with its results, and a list of output validation errors
+    """
+    model, errors = initialize_model(vehicle, nomenclature)
+    if errors:
+        return vehicle, errors
+
+    # parameter means over all the other dimensions,
+    # reduced once the model array holds its final values
+    means = None
+
+    # --- compute results just like before ---
+    if nomenclature == "tcs":
+        results_ecoinvent, results_bafu = format_results_for_tcs_both(data=model, params=vehicle)
+        vehicle["results_ecoinvent"] = _zero_non_finite(results_ecoinvent)
+        vehicle["results_bafu"] = _zero_non_finite(results_bafu)
+
+    elif nomenclature == "swisscargo":
+        vehicle["results"] = format_results_for_swisscargo(data=model, params=vehicle)
+        # add cost results
+        factor = 1 if model.inventory.func_unit == "vkm" else (1 / (float(model.array.sel(parameter="cargo mass")) * 1e-3))
+
+        # currently, it is normalized by the technical lifetime kilometers of the truck
+        # and we want to normalize it instead by the kilometers driven during the ownership period
+        lifetime_km = vehicle.get("lifetime kilometers",
+                                  float(model.array.sel(parameter="lifetime kilometers")))
+        years_of_ownership = vehicle["resale_year"] - vehicle["purchase_year"]
+        km_per_year = vehicle.get("kilometers per year",
+                                  float(model.array.sel(parameter="kilometers per year")))
+        km_during_ownership = years_of_ownership * km_per_year
+
+        factor_ownership = lifetime_km / km_during_ownership
+
+        # we need to figure out what was provided by the user (in CHF)
+        # and what need to be converted from EUR to CHF;
+        # the model array is converted first, so that the cost results
+        # and the harvested parameters agree
+        eur_to_chf = 0.94
+        eu_to_ch_price_levels_difference = 1.3  # EUR prices are lower than CHF prices
+        eur_parameters = ["amortised purchase cost"]
+        if not ("purchase cost" in vehicle and vehicle["purchase cost"] > 0):
+            eur_parameters.extend(PURCHASE_COST_COMPONENTS)
+        for cost_type in ("maintenance cost", "insurance cost"):
+            if not (cost_type in vehicle and vehicle[cost_type] > 0):
+                eur_parameters.append(cost_type)
+        scale_parameters(model, eur_parameters, eur_to_chf * eu_to_ch_price_levels_difference)
+
+        means = _mean_by_parameter(model)
+        vehicle["cost_results"] = {p: means[p] * factor for p in cost_results_parameters}
+        vehicle["cost_results"]["amortised purchase cost"] *= factor_ownership
+        vehicle["cost_results"]["amortised component replacement cost"] *= factor_ownership
+        if vehicle["powertrain"] in ("BEV", "FCEV"):
+            if vehicle.get("replacement_cost_included", False) is False:
+                # we assume the components replacement cost is borne by the next owner
+                # hence we zero it out here
+                vehicle["cost_results"]["amortised component replacement cost"] = 0.0
+
+        lsva_costs = calculate_lsva_charge_period(vehicle)
+
+        # add LSVA/RPLP road charge calculation
+        vehicle["cost_results"]["CO2 tax cost"] =  lsva_costs["cost_per_km_chf"] * factor
+        vehicle["road charge details"] = lsva_costs
+
+        # add cantonal road charge
+        canton_road_charge = canton_truck_tax(vehicle)
+        vehicle["cost_results"]["canton road charge cost"] = canton_road_charge["chf_per_km"] * factor
+        vehicle["canton tax details"] = canton_road_charge
+
+    else:
+        vehicle["results"] = serialize_xarray(model.results)
+
+    # harvest parameters, averaged over all other dimensions
+    if means is None:
+        means = _mean_by_parameter(model)
+    present = [p for p in default_vehicle_parameters if p in means]
+    values = np.fromiter((means[p] for p in present), dtype=np.float64, count=len(present))
+    # consumptions are reported per 100 km
+    values = np.where(
+        np.isin(present, ("fuel consumption", "electricity consumption")), values * 100, values
     )
+    np.nan_to_num(values, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    vehicle.update(zip(present, values.tolist()))
+
+    inventory = model.inventory
+    vehicle["battery chemistry"] = next(iter(model.energy_storage["electric"].values()))
+    vehicle["indicators"] = inventory.method
+    vehicle["indicator type"] = inventory.indicator
+    vehicle["scenario"] = inventory.scenario
+    vehicle["functional unit"] = inventory.func_unit
+
+    vehicle[f"{CARCULATOR_MODEL_LABELS[vehicle['vehicle_type']]} version"] = ".".join(map(str, model.version))
+
+    if nomenclature in ("swisscargo", "tcs"):
+        vehicle["LCA background database"] = "UVEK 2022"
+    else:
+        vehicle["LCA background database"] = f"ecoinvent - cutoff - {model.ecoinvent_version}"
+    vehicle["country"] = country_code
+
+    # --- free memory NOW ---
+    # (one full collection runs once all vehicles are done)
+    del model
+
+    return vehicle, []
+
+
+def _mean_by_parameter(model) -> dict:
+    """
+    Means of all the parameters over all the other dimensions of the model array,
+    computed in a single reduction.
+    :return: dict parameter name -> mean
+    """
+    axis = model.array.get_axis_num("parameter")
+    values = model.array.values.mean(
+        axis=tuple(a for a in range(model.array.ndim) if a != axis)
+    )
+
+    return dict(zip(model.array.coords["parameter"].values.tolist(), values.tolist()))
+
+
+def _zero_non_finite(results: dict) -> dict:
+    """
+    Replaces the NaN and infinite values of a flat dict of results by 0, in place.
+    """
+    values = np.fromiter(results.values(), dtype=np.float64, count=len(results))
+    np.nan_to_num(values, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    results.update(zip(results.keys(), values.tolist()))
+
+    return results
+
+
+def _group_identical_vehicles(vehicles: list) -> dict:
+    """
+    Groups the vehicles whose parameters are identical, apart from their id.
+    :return: dict of canonical vehicle parameters (bytes) -> list of vehicle indices,
+    in order of first appearance
+    """
+    groups = {}
+    for i, vehicle in enumerate(vehicles):
+        key = orjson.dumps(
+            {k: v for k, v in vehicle.items() if k != "id"},
+            option=orjson.OPT_SORT_KEYS,
+            default=str,
+        )
+        groups.setdefault(key, []).append(i)
+
+    return groups
+
+
+def _vehicle_cache_key(vehicle_key: bytes, nomenclature: str, country_code: str) -> str:
+    """
+    Key of a processed vehicle in the cache, from its canonical parameters
+    (see `_group_identical_vehicles`) and the request settings affecting its results.
+    """
+    return hashlib.blake2b(
+        vehicle_key + f"|{nomenclature}|{country_code}".encode(), digest_size=16
+    ).hexdigest()
+
+
+def _get_cached_vehicle(key: str):
+    """
+    Returns the processed vehicle stored under the key, or None.
+    Cached vehicles are immutable: the returned dict is shared and
+    must not be modified, not even its nested values.
+    """
+    with _VEHICLE_CACHE_LOCK:
+        vehicle = _VEHICLE_CACHE.get(key)
+        if vehicle is not None:
+            _VEHICLE_CACHE.move_to_end(key)
+
+    return vehicle
+
+
+def _cache_vehicle(key: str, vehicle: dict):
+    """
+    Stores a processed vehicle, evicting the least recently used ones
+    beyond VEHICLE_CACHE_SIZE. Does nothing if the cache is disabled.
+    """
+    if VEHICLE_CACHE_SIZE <= 0:
+        return
+
+    with _VEHICLE_CACHE_LOCK:
+        _VEHICLE_CACHE[key] = vehicle
+        _VEHICLE_CACHE.move_to_end(key)
+        while len(_VEHICLE_CACHE) > VEHICLE_CACHE_SIZE:
+            _VEHICLE_CACHE.popitem(last=False)
+
+
+def _warm_caches(vehicles: list, nomenclature: str):
+    """
+    Builds the static arrays (and BAFU factors) the vehicles need before
+    they are computed, so that the threads do not race to build them.
+    """
+    for vehicle in vehicles:
+        get_static_array(vehicle["vehicle_type"], vehicle["powertrain"], vehicle["size"])
+
+    if nomenclature in ("tcs", "swisscargo"):
+        load_bafu_emission_factors()
+
 
 def serialize_xarray(data):
     """
     Turn xarray into a nested dictionary, which can be serialized to JSON.
+    The layout is the one of `DataArray.to_dict()`, so that clients can
+    rebuild the array with `DataArray.from_dict()`. The values are kept
+    as a numpy array, which orjson serializes directly; the coordinates,
+    which hold strings, are converted with a single numpy `tolist()` call.
     :param data: xarray
     :return: dict
     """
-    return data.to_dict()
+    return {
+        "dims": data.dims,
+        "attrs": dict(data.attrs),
+        # orjson only serializes C-contiguous arrays
+        "data": np.ascontiguousarray(data.values),
+        "coords": {
+            k: {
+                "dims": v.dims,
+                "attrs": dict(v.attrs),
+                "data": v.values.tolist(),
+            }
+            for k, v in data.coords.items()
+        },
+        "name": data.name,
+    }
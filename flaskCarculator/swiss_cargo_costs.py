@@ -3,13 +3,77 @@ This module calculates road and CO2 charges for trucks according to Swiss regula
 """
 
 import re
+from bisect import bisect_left
+from itertools import chain, repeat
 from typing import Dict, Any, List
-import math
 import unicodedata
 import re
 from typing import Dict, Any, Optional, Tuple
 
 
+# ---- Patterns, compiled once ----
+# tonnes in a size like "40t" or "3.5 t"
+_SIZE_RE = re.compile(r"([0-9]+(?:\.[0-9]+)?)\s*t")
+# bands of the "original class name", once lowercased and stripped of spaces
+_CLASS_EQ_RE = re.compile(r"=(\d+(?:\.\d+)?)t")
+_CLASS_RANGE_RE = re.compile(r">(\d+(?:\.\d+)?)(?:t)?-(\d+(?:\.\d+)?)t")
+_CLASS_OPEN_RE = re.compile(r">(\d+(?:\.\d+)?)t$")
+
+# ---- LSVA tariffs (CHF per tonne-km) ----
+LSVA_CAT_I = 0.0326   # Euro 0–V
+LSVA_CAT_II = 0.0282  # Euro VI/VII from 2029
+LSVA_CAT_III = 0.0239 # Euro VI/VII until 2028, BEV/FCEV from 2029
+
+# ---- Powertrain groups ----
+ZERO_EMISSION_POWERTRAINS = frozenset({"BEV", "FCEV"})
+# HEV-d and PHEV-d are treated like ICE
+COMBUSTION_POWERTRAINS = frozenset({"ICEV-d", "ICEV-g", "HEV-d", "PHEV-d"})
+# upper-cased powertrains taxed at the Category-2 tariff in Graubünden
+_GR_CAT2_POWERTRAINS = frozenset({"BEV", "HEV-D", "PHEV-D"})
+
+# ---- BEV/FCEV rebate schedule (fraction), one entry per year from 2029 to 2035 ----
+BEV_FCEV_REBATE_START = 2029
+BEV_FCEV_REBATE = (0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1)
+
+# years from which the LSVA rate of a powertrain may change (2029 to 2036)
+_LSVA_RATE_CHANGES = tuple(
+    range(BEV_FCEV_REBATE_START, BEV_FCEV_REBATE_START + len(BEV_FCEV_REBATE) + 1)
+)
+
+
+def _lsva_rate_chf_per_tkm(pt: str, modern_vi_vii: bool, y: int) -> float:
+    """
+    LSVA tariff (CHF per tonne-km) for a powertrain in a given year.
+    `modern_vi_vii` tells whether a combustion vehicle is Euro VI/VII.
+    """
+    # Zero-emission vehicles
+    if pt in ZERO_EMISSION_POWERTRAINS:
+        if y <= 2028:
+            return 0.0
+        if y < BEV_FCEV_REBATE_START + len(BEV_FCEV_REBATE):
+            return LSVA_CAT_III * (1.0 - BEV_FCEV_REBATE[y - BEV_FCEV_REBATE_START])
+        return LSVA_CAT_III  # 2036+
+    # Treat HEV-d and PHEV-d like ICE
+    if modern_vi_vii and pt in COMBUSTION_POWERTRAINS:
+        return LSVA_CAT_III if y <= 2028 else LSVA_CAT_II
+    # Older Euro 0–V (or any ICE assumed older)
+    if pt in COMBUSTION_POWERTRAINS:
+        return LSVA_CAT_I
+    # Fallback: if an unknown powertrain is passed
+    raise ValueError(f"Unsupported powertrain '{pt}'.")
+
+
+def _lsva_rate_segments(
+    pt: str, modern_vi_vii: bool, start: int, end: int
+) -> List[Tuple[int, int, float]]:
+    """
+    Splits the years [start, end) into spans of constant LSVA tariff.
+    :return: list of (first year, year after the last, CHF per tonne-km)
+    """
+    bounds = [start, *(y for y in _LSVA_RATE_CHANGES if start < y < end), end]
+    return [(a, b, _lsva_rate_chf_per_tkm(pt, modern_vi_vii, a)) for a, b in zip(bounds, bounds[1:])]
+
+
 def calculate_lsva_charge_period(vehicle_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Compute Swiss LSVA/RPLP road charges over a specified ownership period,
@@ -60,73 +124,52 @@ def calculate_lsva_charge_period(vehicle_data: Dict[str, Any]) -> Dict[str, Any]
         raise ValueError("'resale_year' must be strictly greater than 'purchase_year'.")
 
     # Extract tonnes from e.g. "40t", "3.5 t"
-    m = re.search(r"([0-9]+(?:\.[0-9]+)?)\s*t", size_str)
-    if not m:
-        raise ValueError("Could not parse tonnes from 'size'. Expected like '40t' or '3.5 t'.")
-    tonnes = float(m.group(1))
+    whole, dot, fraction = size_str[:-1].partition(".")
+    if (
+        size_str.endswith("t") and size_str.isascii() and whole.isdigit()
+        and (not dot or fraction.isdigit())
+    ):
+        # plain sizes, such as "40t" or "3.5t", need no regex (same reading as _SIZE_RE)
+        tonnes = float(size_str[:-1])
+    else:
+        m = _SIZE_RE.search(size_str)
+        if not m:
+            raise ValueError("Could not parse tonnes from 'size'. Expected like '40t' or '3.5 t'.")
+        tonnes = float(m.group(1))
     if tonnes <= 0:
         raise ValueError("Gross mass (tonnes) must be > 0.")
 
-    # ---- Tariffs (CHF per tonne-km) ----
-    CAT_I = 0.0326   # Euro 0–V
-    CAT_II = 0.0282  # Euro VI/VII from 2029
-    CAT_III = 0.0239 # Euro VI/VII until 2028, BEV/FCEV from 2029
-
-    # ---- BEV/FCEV rebate schedule (fraction) ----
-    bev_fcev_rebate = {
-        2029: 0.7,
-        2030: 0.6,
-        2031: 0.5,
-        2032: 0.4,
-        2033: 0.3,
-        2034: 0.2,
-        2035: 0.1,
-    }
-
     # ---- Determine Euro class bucket for ICE based on manufacture year ----
     # Heuristic:
     #   manuf_year >= 2014 -> Euro VI/VII (modern)
     #   manuf_year <= 2013 -> Euro 0–V (older)
     modern_vi_vii = manuf_year >= 2014
 
-    def rate_chf_per_tkm_for_year(y: int) -> float:
-        # Zero-emission vehicles
-        if pt in {"BEV", "FCEV"}:
-            if y <= 2028:
-                return 0.0
-            if 2029 <= y <= 2035:
-                rebate = bev_fcev_rebate.get(y, 0.0)
-                return CAT_III * (1.0 - rebate)
-            return CAT_III  # 2036+
-        # Treat HEV-d and PHEV-d like ICE
-        if modern_vi_vii and pt in {"ICEV-d", "ICEV-g", "HEV-d", "PHEV-d"}:
-            return CAT_III if y <= 2028 else CAT_II
-        # Older Euro 0–V (or any ICE assumed older)
-        if pt in {"ICEV-d", "ICEV-g", "HEV-d", "PHEV-d"}:
-            return CAT_I
-        # Fallback: if an unknown powertrain is passed
-        raise ValueError(f"Unsupported powertrain '{pt}'.")
-
     # ---- Iterate over years in the ownership window ----
-    years = list(range(purchase_year, resale_year))  # resale year not driven
-    total_km = km_per_year * len(years)
-    breakdown: List[Dict[str, Any]] = []
-    total_charge = 0.0
-
-    for y in years:
-        rate = rate_chf_per_tkm_for_year(y)
-        km = km_per_year
-        chf = rate * tonnes * km  # CHF/(t·km) * t * km
-        breakdown.append({
+    years = range(purchase_year, resale_year)  # resale year not driven
+    n_years = resale_year - purchase_year
+    total_km = km_per_year * n_years
+    tkm_per_year = tonnes * km_per_year
+
+    # the rate is constant between policy changes: one rate per span of years
+    segments = _lsva_rate_segments(pt, modern_vi_vii, purchase_year, resale_year)
+    total_charge = sum(rate * (b - a) for a, b, rate in segments) * tkm_per_year
+
+    cost_per_km = (total_charge / total_km) if total_km > 0 else 0.0
+
+    # always built: the route returns it as the road charge details
+    breakdown: List[Dict[str, Any]] = [
+        {
             "year": y,
-            "km": km,
+            "km": km_per_year,
             "tonnes": tonnes,
             "rate_chf_per_tkm": rate,
-            "charge_chf": chf,
-        })
-        total_charge += chf
-
-    cost_per_km = (total_charge / total_km) if total_km > 0 else 0.0
+            "charge_chf": rate * tkm_per_year,  # CHF/(t·km) * t * km
+        }
+        for y, rate in zip(
+            years, chain.from_iterable(repeat(rate, b - a) for a, b, rate in segments)
+        )
+    ]
 
     return {
         "total_charge_chf": total_charge,
@@ -135,20 +178,35 @@ def calculate_lsva_charge_period(vehicle_data: Dict[str, Any]) -> Dict[str, Any]
         "breakdown": breakdown,
     }
 
+# accented letters of the canton names -> their base letter
+_CANTON_DIACRITICS = str.maketrans(
+    "àâäçèéêëîïôöùûüÀÂÄÇÈÉÊËÎÏÔÖÙÛÜ",
+    "aaaceeeeiioouuuAAACEEEEIIOOUUU",
+)
+
 def _normalize_canton(s: str) -> str:
-    s = unicodedata.normalize("NFKD", s).encode("ascii","ignore").decode("ascii")
+    # canton codes and names are nearly always plain ASCII
+    if s.isascii():
+        return s.strip().lower()
+    s = s.translate(_CANTON_DIACRITICS)
+    if not s.isascii():
+        # any other non-ASCII character: decompose it, and drop what is left
+        s = unicodedata.normalize("NFKD", s).encode("ascii","ignore").decode("ascii")
     return s.strip().lower()
 
+# drops the spaces of a number, and reads a decimal comma as a point
+_NUMBER_TRANS = str.maketrans({" ": None, ",": "."})
+
 def _parse_tonnes(size) -> Optional[float]:
     if size is None:
         return None
     if isinstance(size, (int, float)):
         return float(size)
-    s = str(size).lower().replace(" ", "")
+    s = str(size).lower().translate(_NUMBER_TRANS)
     if s.endswith("t"):
         s = s[:-1]
     try:
-        return float(s.replace(",", "."))
+        return float(s)
     except ValueError:
         return None
 
@@ -162,18 +220,18 @@ def _infer_euro_truck(year: int, euro_class: Optional[str] = None) -> str:
 def _parse_original_class(original: str) -> Optional[Tuple[str, Optional[float], Optional[float]]]:
     if not original:
         return None
-    s = original.strip().lower().replace(" ", "").replace(",", ".")
+    s = original.strip().lower().translate(_NUMBER_TRANS)
     vehicle_type = "articulated" if s.startswith(("lz/sz","lzsz")) else ("rigid" if s.startswith("lkw") else None)
     if vehicle_type is None:
         return None
-    m_eq = re.search(r"=(\d+(?:\.\d+)?)t", s)
+    m_eq = _CLASS_EQ_RE.search(s)
     if m_eq:
         v = float(m_eq.group(1))
         return (vehicle_type, v, v)
-    m_range = re.search(r">(\d+(?:\.\d+)?)(?:t)?-(\d+(?:\.\d+)?)t", s)
+    m_range = _CLASS_RANGE_RE.search(s)
     if m_range:
         return (vehicle_type, float(m_range.group(1)), float(m_range.group(2)))
-    m_open = re.search(r">(\d+(?:\.\d+)?)t$", s)
+    m_open = _CLASS_OPEN_RE.search(s)
     if m_open:
         return (vehicle_type, float(m_open.group(1)), None)
     return None
@@ -189,44 +247,51 @@ def _tonnes_from_band(min_t: Optional[float], max_t: Optional[float], strategy:
         return float(min_t)
     return (float(min_t) + float(max_t)) / 2.0
 
+def _iceil(n: int, d: int) -> int:
+    """Integer ceiling of n / d."""
+    return -(-n // d)
+
 # ---------- canton annual formulas already in your model (ZH/GE/VD/TI/GR/VS) ----------
-def _zurich_annual(weight_kg: int, euro: Optional[str], powertrain: str) -> float:
+# the canton formulas take the upper-cased powertrain,
+# and whether the truck is Euro 6/VII (see `canton_truck_tax`)
+def _zurich_annual(weight_kg: int, modern_euro: bool, pt_upper: str) -> float:
     base = 254.0
     if weight_kg > 4000:
-        base += 35.0 * math.ceil((weight_kg - 4000) / 500)
-    if powertrain.upper() in {"BEV", "FCEV"}:
+        base += 35.0 * _iceil(weight_kg - 4000, 500)
+    if pt_upper in ZERO_EMISSION_POWERTRAINS:
         surcharge = 300.0
     else:
-        e = (euro or "").lower()
-        surcharge = 300.0 if any(x in e for x in ("6","vii","7")) else 900.0
+        surcharge = 300.0 if modern_euro else 900.0
     return base + surcharge
 
-def _geneva_annual(weight_kg: int, year: int, powertrain: str) -> float:
-    brackets = [
-        (4000, 651.0), (4500, 716.0), (5000, 781.0), (5500, 846.0),
-        (6000, 911.0), (6500, 976.0), (7000, 1041.0), (7500, 1106.0),
-        (8000, 1171.0), (8500, 1236.0), (9000, 1301.0), (9500, 1366.0),
-        (10000, 1431.0), (10500, 1496.0), (11000, 1561.0), (11500, 1626.0),
-        (12000, 1691.0), (12500, 1756.0), (13000, 1821.0),
-    ]
+# Genève weight brackets: upper bounds (kg) and annual tax (CHF)
+_GENEVA_BRACKET_KG = (
+    4000, 4500, 5000, 5500, 6000, 6500, 7000, 7500, 8000, 8500,
+    9000, 9500, 10000, 10500, 11000, 11500, 12000, 12500, 13000,
+)
+_GENEVA_BRACKET_CHF = (
+    651.0, 716.0, 781.0, 846.0, 911.0, 976.0, 1041.0, 1106.0, 1171.0, 1236.0,
+    1301.0, 1366.0, 1431.0, 1496.0, 1561.0, 1626.0, 1691.0, 1756.0, 1821.0,
+)
+
+def _geneva_annual(weight_kg: int, year: int, pt_upper: str) -> float:
     if weight_kg <= 3500:
         amt = 350.5
     elif weight_kg > 13000:
         amt = 1837.0
     else:
-        amt = next(val for ub, val in brackets if weight_kg <= ub)
-    if powertrain.upper() in {"BEV","FCEV"} and year >= 2025:
+        amt = _GENEVA_BRACKET_CHF[bisect_left(_GENEVA_BRACKET_KG, weight_kg)]
+    if pt_upper in ZERO_EMISSION_POWERTRAINS and year >= 2025:
         amt *= 0.5
     return amt
 
-def _vaud_annual(weight_kg: int, powertrain: str, euro: Optional[str]) -> float:
+def _vaud_annual(weight_kg: int, pt_upper: str, modern_euro: bool) -> float:
     amt = 450.0
     if weight_kg > 4000:
-        amt += 78.0 * math.ceil((weight_kg - 4000) / 1000)
-    if powertrain.upper() == "BEV":
+        amt += 78.0 * _iceil(weight_kg - 4000, 1000)
+    if pt_upper == "BEV":
         return amt * 0.10  # −90%
-    e = (euro or "").lower()
-    return amt * (0.65 if any(x in e for x in ("6","vii","7")) else 1.0)
+    return amt * (0.65 if modern_euro else 1.0)
 
 def _ticino_annual(power_kw: float) -> float:
     return 105.0 + 10.0 * float(power_kw)
@@ -235,32 +300,32 @@ def _gr_cat2(weight_kg: int) -> float:
     amt = 450.50
     if weight_kg > 2000:
         up_to = min(16000, weight_kg)
-        amt += 15.10 * math.ceil((up_to - 2000) / 100)
+        amt += 15.10 * _iceil(up_to - 2000, 100)
     if weight_kg > 16000:
-        amt += 11.30 * math.ceil((weight_kg - 16000) / 100)
+        amt += 11.30 * _iceil(weight_kg - 16000, 100)
     return amt
 
-def _graubuenden_annual(weight_kg: int, powertrain: str) -> float:
-    if powertrain.upper() in {"BEV","HEV-D","PHEV-D"}:
+def _graubuenden_annual(weight_kg: int, pt_upper: str) -> float:
+    if pt_upper in _GR_CAT2_POWERTRAINS:
         return 0.20 * _gr_cat2(weight_kg)
     amt = 595.80
     if weight_kg > 3500:
         add1 = min(weight_kg, 6500) - 3500
         if add1 > 0:
-            amt += 12.0 * math.ceil(add1 / 100)
+            amt += 12.0 * _iceil(add1, 100)
         if weight_kg > 6500:
             add2 = min(weight_kg, 16000) - 6500
-            amt += 9.30 * math.ceil(add2 / 100)
+            amt += 9.30 * _iceil(add2, 100)
         if weight_kg > 16000:
             add3 = weight_kg - 16000
-            amt += 8.50 * math.ceil(add3 / 100)
+            amt += 8.50 * _iceil(add3, 100)
     return amt
 
 def _valais_annual(weight_kg: int) -> float:
     if weight_kg <= 4000:
         return 400.0
     if weight_kg <= 15000:
-        return 400.0 + 57.50 * math.ceil((weight_kg - 4000) / 1000)
+        return 400.0 + 57.50 * _iceil(weight_kg - 4000, 1000)
     if weight_kg <= 23000:
         return 1500.0
     if weight_kg <= 32000:
@@ -268,7 +333,7 @@ def _valais_annual(weight_kg: int) -> float:
     return 2000.0
 
 # ---------- NEW: Bern (BE) ----------
-def _bern_annual(weight_kg: int, powertrain: str, first_reg_year: int, this_year: int) -> float:
+def _bern_annual(weight_kg: int, pt_upper: str, first_reg_year: int, this_year: int) -> float:
     """
     Normal tariff: first 1000 kg = 240 CHF; each subsequent *tonne* is 14% less
     than the *previous* per-tonne step. Pro-rata by days ignored here (full year).
@@ -281,16 +346,15 @@ def _bern_annual(weight_kg: int, powertrain: str, first_reg_year: int, this_year
         # full 1000 kg blocks after the first 1000
         full_tonnes_after = max(0, (kg - 1000) // 1000)
         rem_kg = max(0, (kg - 1000) % 1000)
-        total = first_1000_rate
-        rate = first_1000_rate * (1 - 0.14)  # next 1'000 kg
-        for _ in range(int(full_tonnes_after)):
-            total += rate
-            rate *= (1 - 0.14)
+        # the first 1'000 kg and each full tonne after them form a geometric series
+        decay = 1 - 0.14
+        next_rate = first_1000_rate * decay ** (int(full_tonnes_after) + 1)
+        total = (first_1000_rate - next_rate) / (1 - decay)
         if rem_kg > 0:
-            total += rate * (rem_kg / 1000.0)
+            total += next_rate * (rem_kg / 1000.0)
         return total
 
-    if powertrain.upper() == "BEV":
+    if pt_upper == "BEV":
         base = _geometric_sum(weight_kg, 120.0)
         # 60% rebate for first registration year and next 3 years
         if this_year >= first_reg_year and this_year <= first_reg_year + 3:
@@ -306,46 +370,127 @@ def _baselland_annual(weight_kg: int) -> float:
     return 0.121446 * float(weight_kg)
 
 # ---------- NEW: Fribourg (FR) ----------
+# Fribourg weight brackets: upper bounds (kg) and annual tax (CHF)
+_FRIBOURG_BRACKET_KG = (7500, 14000, 20000, 26000, 32000)
+_FRIBOURG_BRACKET_CHF = (1140.0, 1666.0, 2192.0, 2718.0, 3244.0, 3770.0)  # last: ≥32'001 kg
+
 def _fribourg_annual(weight_kg: int) -> float:
     """
     2025 heavy-vehicle table (FR). Brackets (CHF) for >3.5t “voiture automobile, camion, tracteur à sellette, véhicule articulé …”
     """
-    tbl = [
-        (7500, 1140.0),
-        (14000, 1666.0),
-        (20000, 2192.0),
-        (26000, 2718.0),
-        (32000, 3244.0),
-        (10**9, 3770.0),  # ≥32'001 kg
-    ]
     if weight_kg <= 3500:
         return 0.0  # below “lourd” threshold; out of scope here
-    for ub, val in tbl:
-        if weight_kg <= ub:
-            return val
-    return tbl[-1][1]
+    return _FRIBOURG_BRACKET_CHF[bisect_left(_FRIBOURG_BRACKET_KG, weight_kg)]
 
 # ---------- NEW: Aargau (AG) ----------
+# Aargau payload bands: upper bounds (kg) and annual charge (CHF)
+_AARGAU_BAND_KG = (
+    1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000, 5500,
+    6000, 6500, 7000, 7500, 8000, 8500, 9000, 9500,
+)
+_AARGAU_BAND_CHF = (
+    348.0, 420.0, 492.0, 564.0, 636.0, 708.0, 780.0, 852.0, 936.0,
+    1020.0, 1104.0, 1188.0, 1272.0, 1356.0, 1440.0, 1524.0, 1608.0,
+)
+
 def _aargau_annual(payload_kg: int) -> float:
     """
     Nutzfahrzeuge über 1'000 kg Nutzlast – annual charge by payload band.
     """
-    bands = [
-        (1500, 348.0), (2000, 420.0), (2500, 492.0), (3000, 564.0),
-        (3500, 636.0), (4000, 708.0), (4500, 780.0), (5000, 852.0),
-        (5500, 936.0), (6000, 1020.0), (6500, 1104.0), (7000, 1188.0),
-        (7500, 1272.0), (8000, 1356.0), (8500, 1440.0), (9000, 1524.0),
-        (9500, 1608.0),
-    ]
     if payload_kg < 1000:
         raise ValueError("AG expects payload >= 1'000 kg (else use the 'Motorwagen' schedule).")
-    for ub, val in bands:
-        if payload_kg <= ub:
-            return val
+    if payload_kg <= _AARGAU_BAND_KG[-1]:
+        return _AARGAU_BAND_CHF[bisect_left(_AARGAU_BAND_KG, payload_kg)]
     # > 9'500 kg payload – the published page stops here; assume step continues +84 CHF per 500 kg
-    extra_steps = math.ceil((payload_kg - 9500) / 500)
+    extra_steps = _iceil(payload_kg - 9500, 500)
     return 1608.0 + extra_steps * 84.0
 
+# ---------- canton handlers ----------
+# each returns the annual tax (CHF), the per-year details (None if constant) and notes
+def _per_year_average(annual_for_year, y0: int, y1: int):
+    per_year, total = [], 0.0
+    for yr in range(y0, y1 + 1):
+        a = annual_for_year(yr)
+        per_year.append({"year": yr, "annual_tax_chf": round(a, 2)})
+        total += a
+    years = _years_owned_inclusive(y0, y1)
+    return (total / years if years else 0.0), per_year
+
+def _zurich_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    return _zurich_annual(weight_kg, modern_euro, pt_upper), None, []
+
+def _geneva_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    annual, per_year = _per_year_average(lambda yr: _geneva_annual(weight_kg, yr, pt_upper), y0, y1)
+    return annual, per_year, ["Genève: −50% for BEV/FCEV from 2025 applied year-by-year."]
+
+def _vaud_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    return _vaud_annual(weight_kg, pt_upper, modern_euro), None, []
+
+def _ticino_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    if "power" not in vehicle_data:
+        raise ValueError("Ticino requires 'power' (kW).")
+    return _ticino_annual(float(vehicle_data["power"])), None, ["Ticino formula: CHF 105 + 10 × kW."]
+
+def _graubuenden_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    return (
+        _graubuenden_annual(weight_kg, pt_upper),
+        None,
+        ["Graubünden: EV/(H)EV trucks pay 20% of Category-2 weight tariff."],
+    )
+
+def _valais_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    return _valais_annual(weight_kg), None, []
+
+def _bern_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    # apply BE year-by-year (for BEV’s 4-year rebate)
+    # first registration year defaults to manufacture year if not given
+    first_reg = int(vehicle_data.get("first_registration_year", int(vehicle_data["year"])))
+    annual, per_year = _per_year_average(lambda yr: _bern_annual(weight_kg, pt_upper, first_reg, yr), y0, y1)
+    return annual, per_year, [
+        "Bern: geometric weight tariff (−14% per extra tonne); BEV −60% for first 4 reg. years."
+    ]
+
+def _baselland_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    return (
+        _baselland_annual(weight_kg),
+        None,
+        ["Basel-Landschaft: Lastwagen CHF/kg weight rate (variable tax table)."],
+    )
+
+def _fribourg_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    return (
+        _fribourg_annual(weight_kg),
+        None,
+        ["Fribourg: heavy-vehicle fixed weight brackets (2025 tariff)."],
+    )
+
+def _aargau_tax(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1):
+    if "payload" not in vehicle_data:
+        raise ValueError("Aargau requires 'payload' (Nutzlast) for trucks.")
+    return (
+        _aargau_annual(int(vehicle_data["payload"])),
+        None,
+        ["Aargau: trucks taxed by payload (Nutzlast) bands."],
+    )
+
+# normalized canton name or abbreviation -> handler
+_CANTON_HANDLERS = {
+    name: handler
+    for names, handler in (
+        (("zh", "zuerich", "zurich", "zurich city"), _zurich_tax),
+        (("ge", "geneve", "geneva"), _geneva_tax),
+        (("vd", "vaud"), _vaud_tax),
+        (("ti", "ticino"), _ticino_tax),
+        (("gr", "graubunden", "graubuenden", "grisons"), _graubuenden_tax),
+        (("vs", "valais"), _valais_tax),
+        (("be", "bern", "berne"), _bern_tax),
+        (("bl", "baselland", "basel-landschaft", "basel landschaft"), _baselland_tax),
+        (("fr", "fribourg", "freiburg"), _fribourg_tax),
+        (("ag", "aargau"), _aargau_tax),
+    )
+    for name in names
+}
+
 # ---------- public API ----------
 def canton_truck_tax(vehicle_data: Dict[str, Any], *, band_estimation: str = "midpoint") -> Dict[str, Any]:
     """
@@ -391,74 +536,20 @@ def canton_truck_tax(vehicle_data: Dict[str, Any], *, band_estimation: str = "mi
             weight_source = "original class name"
         else:
             tonnes = None
-    if canton in {"ag", "aargau"} and "payload" not in vehicle_data:
-        # For AG we must use payload-based table; weight may still be useful for your other modules.
-        pass
-    if tonnes is None and canton not in {"ag","aargau"}:
+    handler = _CANTON_HANDLERS.get(canton)
+    # For AG we must use payload-based table; the other cantons need the weight.
+    if tonnes is None and handler is not _aargau_tax:
         raise ValueError("Provide 'size' (e.g., '40t') or a parseable 'original class name'.")
+    if handler is None:
+        raise ValueError(f"Unsupported/unknown canton '{canton_raw}'.")
 
     weight_kg = int(round(tonnes * 1000)) if tonnes is not None else None
 
-    # dispatch per canton
-    per_year = None
-    notes = []
-    if canton in {"zh","zuerich","zurich","zurich city"}:
-        annual = _zurich_annual(weight_kg, euro, pt)
-
-    elif canton in {"ge","geneve","geneva"}:
-        per_year, total = [], 0.0
-        for yr in range(y0, y1 + 1):
-            a = _geneva_annual(weight_kg, yr, pt)
-            per_year.append({"year": yr, "annual_tax_chf": round(a, 2)})
-            total += a
-        annual = total / years if years else 0.0
-        notes.append("Genève: −50% for BEV/FCEV from 2025 applied year-by-year.")
-
-    elif canton in {"vd","vaud"}:
-        annual = _vaud_annual(weight_kg, pt, euro)
-
-    elif canton in {"ti","ticino"}:
-        if "power" not in vehicle_data:
-            raise ValueError("Ticino requires 'power' (kW).")
-        annual = _ticino_annual(float(vehicle_data["power"]))
-        notes.append("Ticino formula: CHF 105 + 10 × kW.")
-
-    elif canton in {"gr","graubunden","graubuenden", "grisons"}:
-        annual = _graubuenden_annual(weight_kg, pt)
-        notes.append("Graubünden: EV/(H)EV trucks pay 20% of Category-2 weight tariff.")
-
-    elif canton in {"vs","valais"}:
-        annual = _valais_annual(weight_kg)
-
-    # NEW ones
-    elif canton in {"be","bern","berne"}:
-        # apply BE year-by-year (for BEV’s 4-year rebate)
-        per_year, total = [], 0.0
-        # first registration year defaults to manufacture year if not given
-        first_reg = int(vehicle_data.get("first_registration_year", made_year))
-        for yr in range(y0, y1 + 1):
-            a = _bern_annual(weight_kg, pt, first_reg, yr)
-            per_year.append({"year": yr, "annual_tax_chf": round(a, 2)})
-            total += a
-        annual = total / years if years else 0.0
-        notes.append("Bern: geometric weight tariff (−14% per extra tonne); BEV −60% for first 4 reg. years.")
-
-    elif canton in {"bl","baselland","basel-landschaft","basel landschaft"}:
-        annual = _baselland_annual(weight_kg)
-        notes.append("Basel-Landschaft: Lastwagen CHF/kg weight rate (variable tax table).")
-
-    elif canton in {"fr","fribourg","freiburg"}:
-        annual = _fribourg_annual(weight_kg)
-        notes.append("Fribourg: heavy-vehicle fixed weight brackets (2025 tariff).")
-
-    elif canton in {"ag","aargau"}:
-        if "payload" not in vehicle_data:
-            raise ValueError("Aargau requires 'payload' (Nutzlast) for trucks.")
-        annual = _aargau_annual(int(vehicle_data["payload"]))
-        notes.append("Aargau: trucks taxed by payload (Nutzlast) bands.")
-
-    else:
-        raise ValueError(f"Unsupported/unknown canton '{canton_raw}'.")
+    # normalized once for all the handlers (and years)
+    pt_upper = pt.upper()
+    euro_lower = str(euro).lower()
+    modern_euro = "6" in euro_lower or "vii" in euro_lower or "7" in euro_lower
+    annual, per_year, notes = handler(vehicle_data, weight_kg, pt_upper, modern_euro, y0, y1)
 
     total_tax = annual * years
     chf_per_km = (total_tax / total_km) if total_km > 0 else 0.0
@@ -475,7 +566,7 @@ def canton_truck_tax(vehicle_data: Dict[str, Any], *, band_estimation: str = "mi
         "chf_per_km": round(chf_per_km, 6),
         **({"per_year": per_year} if per_year else {}),
         "notes": notes + [
-            f"Euro class: {_infer_euro_truck(made_year, vehicle_data.get('euro_class'))} (manufacture year {made_year}).",
+            f"Euro class: {euro} (manufacture year {made_year}).",
             "Ownership window treated as calendar-year inclusive.",
         ],
     }
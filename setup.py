@@ -14,7 +14,8 @@ setup(
         'carculator_bus',
         'carculator_utils',
         'requests',
-        'openai'
+        'openai',
+        'orjson',
 
     ],
     entry_points={